@@ -2,6 +2,7 @@ import json
 import os
 import shutil
 import subprocess
+import sys
 import time
 
 import streamlit as st
@@ -9,12 +10,20 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+# The cassette layer is shared with the backend and lives there.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+from gemini_cassette import CassetteClient  # noqa: E402
+
 load_dotenv()
 
 # Configuration constants
 MAX_ITERATIONS = 10
 MAX_RETRIES = 3
 GEMINI_MODEL_NAME = "gemini-2.0-flash"
+# live / record / replay / synthetic (see backend/gemini_cassette.py)
+GEMINI_TRANSPORT = os.environ.get("GEMINI_TRANSPORT", "live").lower()
+GEMINI_CASSETTE_DIR = os.environ.get("GEMINI_CASSETTE_DIR", "cassettes")
+GEMINI_REPLAY_LATENCY = os.environ.get("GEMINI_REPLAY_LATENCY", "recorded").lower()
 
 SYSTEM_INSTRUCTION: str = """\
 Write a Manim program to visually illustrate the following problem with animation:  
@@ -34,6 +43,45 @@ If the error relates to `latex`, do not use `latex` in the fix.
 """
 
 
+SYNTHETIC_MANIM_CODE: str = """\
+from manim import Scene, Text, Write, config
+
+
+class Synthetic(Scene):
+    def construct(self):
+        self.play(Write(Text("synthetic")))
+
+
+def main():
+    config.quality = "low_quality"
+    Synthetic().render()
+
+
+if __name__ == "__main__":
+    main()
+"""
+
+
+def make_gemini_client():
+    """
+    GEMINI_TRANSPORT に応じたクライアントを返す関数
+    record/replay ではレスポンスをカセットに記録・再生し、synthetic では固定のコードを返す
+    """
+    if GEMINI_TRANSPORT == "live":
+        return genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    return CassetteClient(
+        GEMINI_TRANSPORT,
+        GEMINI_CASSETTE_DIR,
+        inner=(
+            genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+            if GEMINI_TRANSPORT == "record"
+            else None
+        ),
+        replay_latency=GEMINI_REPLAY_LATENCY != "zero",
+        synthesize=lambda request: json.dumps({"code": SYNTHETIC_MANIM_CODE}),
+    )
+
+
 def call_gemini_api(prompt: str, system_prompt: str) -> str:
     """
     Gemini API にプロンプトを送信して、manimプログラムのコードを生成する関数
@@ -42,7 +90,7 @@ def call_gemini_api(prompt: str, system_prompt: str) -> str:
     print("=" * 100)
     print(prompt)
     print("=" * 100)
-    client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    client = make_gemini_client()
 
     # 最大再試行回数
     retry_count = 0
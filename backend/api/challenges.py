@@ -1,12 +1,14 @@
 from http import HTTPStatus
 from typing import Dict, Any
-from database.challenge_repository import ChallengeRepository
+import config
+from database.challenge_repository import create_challenge_repository
+from database.challenge_store import ChallengeStore
 from database.models.challenge import Challenge
 
 
 class ChallengesAPIHandler:
     def __init__(self):
-        self.repository = ChallengeRepository()
+        self.repository = ChallengeStore(create_challenge_repository(), max_bytes=config.CHALLENGE_STORE_MAX_BYTES)
 
     def handle_get_challenges(self, path: str) -> Dict[str, Any]:
         try:
@@ -1,21 +1,118 @@
+import asyncio
+import datetime
 import json
-from typing import Any, AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator
 
 import config
 import uvicorn
 from api.challenges import ChallengesAPIHandler
-from code_runner import run_single_test_case, test_code_against_all_cases
-from fastapi import Body, FastAPI, HTTPException, Path
+from code_runner import enable_resource_limits
+from database.solution_repository import SolutionRepository
+from database.variant_repository import VariantRepository
+from fastapi import Body, FastAPI, HTTPException, Path, Request
 from fastapi.middleware.cors import CORSMiddleware
 from gemini_utils import (
+    code_generation_prompt,
     generate_code_logic,
     generate_hint_logic,
     generate_explanation_logic,
+    generate_retire_advice_logic,
     generate_retire_explanation_logic,
+    gemini_stats,
+    stream_hint_logic,
 )
-from starlette.responses import JSONResponse, StreamingResponse
+from gemini_scheduler import GeminiUnavailableError
+from hint_cache import hint_cache_stats
+from llm_metrics import llm_cache_hits
+from metrics import Gauge, Histogram, histogram_summary, render_prometheus
+from request_metrics import RequestMetricsMiddleware
+from result_cache import result_cache_stats
+from runner_pool import SandboxPool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from variant_bank import VariantBank
+
+runner_pool = SandboxPool(
+    size=config.RUNNER_POOL_SIZE,
+    max_jobs_per_worker=config.RUNNER_MAX_JOBS_PER_WORKER,
+    start_method=config.RUNNER_START_METHOD,
+    job_timeout=config.RUN_TIME_LIMIT_SECONDS + config.RUN_KILL_GRACE_SECONDS,
+    initializer=enable_resource_limits,
+)
+
+
+challenges_handler = ChallengesAPIHandler()
+variant_bank = VariantBank(
+    VariantRepository(config.VARIANT_BANK_PATH),
+    challenges_handler.repository,
+    runner_pool.passes_all_cases,
+    target_size=config.VARIANT_BANK_TARGET_SIZE,
+    low_watermark=config.VARIANT_BANK_LOW_WATERMARK,
+    max_refill_attempts=config.VARIANT_BANK_MAX_REFILL_ATTEMPTS,
+)
+solutions = SolutionRepository(config.SOLUTION_STORE_PATH, max_entries=config.SOLUTION_STORE_MAX_ENTRIES)
+
+
+async def _remember_solution(challenge_id: str | None, variant: dict[str, Any]) -> None:
+    """Keep the fix of a handed-out variant for the retire explanation."""
+    if not config.SOLUTION_STORE_ENABLED or not variant.get("code"):
+        return
+    await asyncio.to_thread(
+        solutions.add_solution,
+        variant["code"],
+        {
+            "fixed_code": variant.get("fixed_code"),
+            "explanation": variant.get("explanation"),
+            "challengeId": challenge_id,
+            "createdAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+    )
+
+
+_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+run_wall_time = Histogram(
+    "run_test_case_wall_seconds",
+    "Wall time of main(*input) per test case",
+    _TIME_BUCKETS,
+    labelnames=("challenge_id",),
+)
+run_cpu_time = Histogram(
+    "run_test_case_cpu_seconds",
+    "CPU time of main(*input) per test case",
+    _TIME_BUCKETS,
+    labelnames=("challenge_id",),
+)
+run_peak_memory = Histogram(
+    "run_test_case_peak_memory_bytes",
+    "Peak traced memory of main(*input) per test case",
+    (2**16, 2**18, 2**20, 2**22, 2**24, 2**26, 2**28),
+    labelnames=("challenge_id",),
+)
+run_line_events = Histogram(
+    "run_test_case_line_events",
+    "Executed line events of main(*input) per test case",
+    (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+    labelnames=("challenge_id",),
+)
+
+runner_queue_depth = Gauge("runner_pool_queue_depth", "Test cases waiting for a sandbox worker")
+runner_busy_workers = Gauge("runner_pool_busy_workers", "Sandbox workers running a test case")
+gemini_queued = Gauge(
+    "gemini_scheduler_queued", "Gemini calls waiting for admission", labelnames=("priority",)
+)
+gemini_active = Gauge("gemini_scheduler_active", "Gemini calls in flight")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    runner_pool.start()
+    yield
+    await variant_bank.shutdown()
+    runner_pool.shutdown()
+
 
-app = FastAPI(title="Debug Master Backend", version="1.0.0")
+app = FastAPI(title="Debug Master Backend", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
 
 # CORS (allow all origins for dev simplicity; tighten in production)
 app.add_middleware(
@@ -27,9 +124,6 @@ app.add_middleware(
 )
 
 
-challenges_handler = ChallengesAPIHandler()
-
-
 @app.get("/api/health")
 def health() -> dict[str, str]:
     return {"status": "OK"}
@@ -39,23 +133,27 @@ def health() -> dict[str, str]:
 # Challenges APIs
 # ---------------
 
+# Reads are served as pre-serialized bytes from the in-memory challenge store.
 @app.get("/api/challenges")
-def get_challenges() -> JSONResponse:
-    result = challenges_handler.handle_get_challenges("/api/challenges")
-    if "error" in result:
-        raise HTTPException(status_code=result["status"], detail=result["error"])  # type: ignore[arg-type]
-    return JSONResponse(status_code=result["status"], content=result["data"])  # type: ignore[index]
+def get_challenges() -> Response:
+    try:
+        body = challenges_handler.repository.get_all_challenges_json()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/challenges/{challenge_id}")
 def get_challenge(
     challenge_id: str = Path(..., description="Challenge ID"),
-) -> JSONResponse:
-    path = f"/api/challenges/{challenge_id}"
-    result = challenges_handler.handle_get_challenges(path)
-    if "error" in result:
-        raise HTTPException(status_code=result["status"], detail=result["error"])  # type: ignore[arg-type]
-    return JSONResponse(status_code=result["status"], content=result["data"])  # type: ignore[index]
+) -> Response:
+    try:
+        body = challenges_handler.repository.get_challenge_json(challenge_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    if body is None:
+        raise HTTPException(status_code=404, detail=f"Challenge with ID '{challenge_id}' not found")
+    return Response(content=body, media_type="application/json")
 
 
 @app.post("/api/challenges")
@@ -96,7 +194,56 @@ def _sse_format(data: dict[str, Any]) -> bytes:
     return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
 
 
-async def _sse_generator(code: str, test_cases: list[dict[str, Any]]) -> AsyncGenerator[bytes, None]:
+async def _run_test_case(
+    code: str,
+    test_case: dict[str, Any],
+    collect_metrics: bool = False,
+    challenge_id: str | None = None,
+) -> dict[str, Any]:
+    result = await runner_pool.run_test_case(code, test_case, collect_metrics)
+    metrics = result.get("metrics")
+    if metrics and challenge_id:
+        run_wall_time.observe(metrics["wallTimeMs"] / 1000, challenge_id=challenge_id)
+        run_cpu_time.observe(metrics["cpuTimeMs"] / 1000, challenge_id=challenge_id)
+        run_peak_memory.observe(metrics["peakMemoryBytes"], challenge_id=challenge_id)
+        run_line_events.observe(metrics["lineEvents"], challenge_id=challenge_id)
+    return result
+
+
+async def _iter_until_disconnected(
+    request: Request, tasks: list["asyncio.Task[Any]"]
+) -> AsyncGenerator[Any, None]:
+    """Yield task results as they complete while the client is still connected.
+
+    Remaining tasks are cancelled when the client goes away or the consumer
+    stops iterating.
+    """
+    order = {task: i for i, task in enumerate(tasks)}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=config.DISCONNECT_POLL_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if await request.is_disconnected():
+                return
+            for task in sorted(done, key=order.__getitem__):
+                yield task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _sse_generator(
+    request: Request,
+    code: str,
+    test_cases: list[dict[str, Any]],
+    parallel: bool = False,
+    include_metrics: bool = False,
+    challenge_id: str | None = None,
+) -> AsyncGenerator[bytes, None]:
     if "GEMINI_API_KEY" in code:
         yield _sse_format(
             {
@@ -106,79 +253,276 @@ async def _sse_generator(code: str, test_cases: list[dict[str, Any]]) -> AsyncGe
         )
         return
 
-    for i, test_case in enumerate(test_cases):
-        result = run_single_test_case(code, test_case)
-        payload: dict[str, Any] = {
-            "status": "ok",
-            "testCaseNumber": i + 1,
-            **result,
-        }
-        yield _sse_format(payload)
+    # In parallel mode up to RUN_MAX_PARALLEL_CASES cases of this request run
+    # at once and each result is streamed as soon as it completes. Otherwise
+    # the cases run one at a time and are streamed in order.
+    semaphore = asyncio.Semaphore(config.RUN_MAX_PARALLEL_CASES if parallel else 1)
+    collect_metrics = include_metrics or (config.RUN_COLLECT_METRICS and bool(challenge_id))
+
+    async def _run(index: int, test_case: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        async with semaphore:
+            result = await _run_test_case(code, test_case, collect_metrics, challenge_id)
+        return index, result
+
+    tasks = [asyncio.ensure_future(_run(i, tc)) for i, tc in enumerate(test_cases)]
+    async for i, result in _iter_until_disconnected(request, tasks):
+        if not include_metrics:
+            result.pop("metrics", None)
+        yield _sse_format({"status": "ok", "testCaseNumber": i + 1, **result})
 
 
 @app.post("/api/run-python")
-def run_python(payload: dict[str, Any] = Body(...)) -> StreamingResponse:
+def run_python(request: Request, payload: dict[str, Any] = Body(...)) -> StreamingResponse:
     code: str = payload.get("code", "")
     test_cases: list[dict[str, Any]] = payload.get("testCases", [])
-    gen = _sse_generator(code, test_cases)
+    parallel: bool = bool(payload.get("parallel", config.RUN_PARALLEL_DEFAULT))
+    include_metrics: bool = bool(payload.get("metrics", False))
+    challenge_id: str | None = payload.get("challengeId")
+    gen = _sse_generator(request, code, test_cases, parallel, include_metrics, challenge_id)
     return StreamingResponse(gen, media_type="text/event-stream")
 
 
+async def _grade_submission(
+    submission: dict[str, Any], test_cases: list[dict[str, Any]]
+) -> dict[str, Any]:
+    code: str = submission.get("code", "")
+    if "GEMINI_API_KEY" in code:
+        statuses = ["forbidden"] * len(test_cases)
+    else:
+        results = await asyncio.gather(*(_run_test_case(code, tc) for tc in test_cases))
+        statuses = [result.get("status", "error") for result in results]
+    passed = [status == "success" for status in statuses]
+    return {
+        "submissionId": submission.get("id"),
+        "passed": passed,
+        "statuses": statuses,
+        "passedCount": sum(passed),
+        "allPassed": all(passed),
+    }
+
+
+async def _grade_sse_generator(
+    request: Request, submissions: list[dict[str, Any]], test_cases: list[dict[str, Any]]
+) -> AsyncGenerator[bytes, None]:
+    tasks = [asyncio.ensure_future(_grade_submission(s, test_cases)) for s in submissions]
+    async for row in _iter_until_disconnected(request, tasks):
+        yield _sse_format(row)
+
+
+@app.post("/api/challenges/{challenge_id}/grade", response_model=None)
+async def grade_submissions(
+    request: Request,
+    challenge_id: str = Path(..., description="Challenge ID"),
+    payload: dict[str, Any] = Body(...),
+) -> JSONResponse | StreamingResponse:
+    submissions: list[dict[str, Any]] = payload.get("submissions", [])
+    if not isinstance(submissions, list):
+        raise HTTPException(status_code=400, detail="submissions must be a list")
+    if len(submissions) > config.BATCH_MAX_SUBMISSIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many submissions (max {config.BATCH_MAX_SUBMISSIONS})",
+        )
+    for i, submission in enumerate(submissions):
+        if not isinstance(submission, dict) or not isinstance(submission.get("code", ""), str):
+            raise HTTPException(
+                status_code=400,
+                detail=f"submissions[{i}] must be an object with a string 'code'",
+            )
+    challenge = await asyncio.to_thread(challenges_handler.repository.get_challenge_by_id, challenge_id)
+    if challenge is None:
+        raise HTTPException(status_code=404, detail=f"Challenge with ID '{challenge_id}' not found")
+    test_cases = [test_case.to_dict() for test_case in challenge.testCases]
+
+    if payload.get("stream"):
+        gen = _grade_sse_generator(request, submissions, test_cases)
+        return StreamingResponse(gen, media_type="text/event-stream")
+
+    results = await asyncio.gather(*(_grade_submission(s, test_cases) for s in submissions))
+    return JSONResponse(
+        content={
+            "challengeId": challenge_id,
+            "testCaseCount": len(test_cases),
+            "results": results,
+        }
+    )
+
+
+@app.get("/api/runner/stats")
+def runner_stats() -> dict[str, Any]:
+    return {
+        **runner_pool.stats(),
+        "resultCache": result_cache_stats(),
+        "variantBank": variant_bank.stats(),
+        "challengeStore": challenges_handler.repository.stats(),
+    }
+
+
+@app.get("/api/runner/metrics")
+def runner_metrics() -> dict[str, Any]:
+    return {
+        "wallTimeSeconds": histogram_summary(run_wall_time, "challenge_id"),
+        "cpuTimeSeconds": histogram_summary(run_cpu_time, "challenge_id"),
+        "peakMemoryBytes": histogram_summary(run_peak_memory, "challenge_id"),
+        "lineEvents": histogram_summary(run_line_events, "challenge_id"),
+    }
+
+
+@app.get("/api/metrics")
+def prometheus_metrics() -> Response:
+    pool = runner_pool.stats()
+    runner_queue_depth.set(pool["queueDepth"])
+    runner_busy_workers.set(pool["busy"])
+    scheduler = gemini_stats()["scheduler"]
+    gemini_active.set(scheduler["active"])
+    for priority, count in scheduler["queued"].items():
+        gemini_queued.set(count, priority=priority)
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/gemini/stats")
+def gemini_scheduler_stats() -> dict[str, Any]:
+    return gemini_stats()
+
+
+def _gemini_unavailable(exc: GeminiUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Gemini is busy, please retry shortly: {exc}",
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
+
 @app.post("/api/generate-code")
-def generate_code(payload: dict[str, Any] = Body(...)) -> JSONResponse:
+async def generate_code(payload: dict[str, Any] = Body(...)) -> JSONResponse:
     challenge: str = payload.get("challenge", "")
     test_cases: list[dict[str, Any]] = payload.get("testCases", [])
-    prompt = f"Problem description:\n{challenge}\n"
+    challenge_id: str | None = payload.get("challengeId")
+
+    if challenge_id and config.VARIANT_BANK_ENABLED:
+        variant = await variant_bank.take(challenge_id)
+        if variant is not None:
+            await _remember_solution(challenge_id, variant)
+            return JSONResponse(content={"code": variant["code"], "explanation": variant["explanation"]})
+
+    prompt = code_generation_prompt(challenge)
     try:
-        result = generate_code_logic(prompt, test_cases, test_code_against_all_cases)
+        result = await generate_code_logic(prompt, test_cases, runner_pool.passes_all_cases)
+        # The fix is kept server-side; the learner only gets the buggy code.
+        fixed_code = result.pop("fixed_code", None)
+        if "code" in result:
+            await _remember_solution(challenge_id, {**result, "fixed_code": fixed_code})
         return JSONResponse(content=result)
+    except GeminiUnavailableError as exc:
+        raise _gemini_unavailable(exc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.post("/api/generate-hint")
-def generate_hint(payload: dict[str, Any] = Body(...)) -> JSONResponse:
+async def _hint_sse_generator(
+    code: str, instructions: str, examples: str, test_results: list[dict[str, Any]]
+) -> AsyncGenerator[bytes, None]:
+    count = 0
+    try:
+        async for level in stream_hint_logic(code, instructions, examples, test_results):
+            count += 1
+            yield _sse_format({"status": "ok", **level})
+    except GeminiUnavailableError as exc:
+        yield _sse_format(
+            {
+                "status": "error",
+                "message": f"Gemini is busy, please retry shortly: {exc}",
+                "retryAfter": exc.retry_after,
+            }
+        )
+        return
+    except Exception as exc:
+        yield _sse_format({"status": "error", "message": f"Failed to generate hints: {exc}"})
+        return
+    yield _sse_format({"status": "done", "levelCount": count})
+
+
+@app.post("/api/generate-hint", response_model=None)
+async def generate_hint(payload: dict[str, Any] = Body(...)) -> JSONResponse | StreamingResponse:
     code: str = payload.get("code", "")
     instructions: str = payload.get("instructions", "")
     examples: str = payload.get("examples", "")
     test_results: list[dict[str, Any]] = payload.get("testResults", [])
 
+    if payload.get("stream"):
+        gen = _hint_sse_generator(code, instructions, examples, test_results)
+        return StreamingResponse(gen, media_type="text/event-stream")
+
     try:
-        hints = generate_hint_logic(code, instructions, examples, test_results)
+        hints = await generate_hint_logic(code, instructions, examples, test_results)
+    except GeminiUnavailableError as exc:
+        raise _gemini_unavailable(exc)
     except Exception as exc:  # pragma: no cover - defensive handling
         raise HTTPException(status_code=500, detail=f"Failed to generate hints: {exc}")
 
     return JSONResponse(content={"hints": hints})
 
 
+@app.get("/api/hints/stats")
+def hint_stats() -> dict[str, Any]:
+    return hint_cache_stats()
+
+
 @app.post("/api/generate-explanation")
-def generate_explanation(payload: dict[str, Any] = Body(...)) -> JSONResponse:
+async def generate_explanation(payload: dict[str, Any] = Body(...)) -> JSONResponse:
     before_code: str = payload.get("beforeCode", "")
     after_code: str = payload.get("afterCode", "")
     instructions: str = payload.get("instructions", "")
     examples: str = payload.get("examples", "")
     test_results: list[dict[str, Any]] = payload.get("testResults", [])
     try:
-        explanation = generate_explanation_logic(
+        explanation = await generate_explanation_logic(
             before_code, after_code, instructions, examples, test_results
         )
         return JSONResponse(content=explanation)
+    except GeminiUnavailableError as exc:
+        raise _gemini_unavailable(exc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
 @app.post("/api/generate-retire-explanation")
-def generate_retire_explanation(payload: dict[str, Any] = Body(...)) -> JSONResponse:
+async def generate_retire_explanation(payload: dict[str, Any] = Body(...)) -> JSONResponse:
     before_code: str = payload.get("beforeCode", "")
     after_code: str = payload.get("afterCode", "")
     instructions: str = payload.get("instructions", "")
     examples: str = payload.get("examples", "")
     test_results: list[dict[str, Any]] = payload.get("testResults", [])
+    solution = await asyncio.to_thread(solutions.get_solution, before_code) if config.SOLUTION_STORE_ENABLED else None
     try:
-        explanation = generate_retire_explanation_logic(
+        if solution is not None:
+            llm_cache_hits.inc(
+                endpoint="generate_retire_explanation", model=config.GEMINI_MODEL_NAME, cache="solution_store"
+            )
+            try:
+                explanation = await generate_retire_advice_logic(
+                    before_code,
+                    after_code,
+                    instructions,
+                    examples,
+                    test_results,
+                    solution["fixed_code"],
+                    solution.get("explanation") or "",
+                )
+            except GeminiUnavailableError:
+                # The stored answer is still worth showing without the advice.
+                explanation = {
+                    "answer_code": solution["fixed_code"],
+                    "explanation": solution.get("explanation") or "",
+                    "advice": "",
+                }
+            return JSONResponse(content=explanation)
+        explanation = await generate_retire_explanation_logic(
             before_code, after_code, instructions, examples, test_results
         )
         return JSONResponse(content=explanation)
+    except GeminiUnavailableError as exc:
+        raise _gemini_unavailable(exc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -0,0 +1,208 @@
+"""Benchmark the code runner over the real challenge corpus.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_runner --output benchmarks/baselines/$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_runner --compare benchmarks/baselines/<commit>.json
+
+Every challenge in database/data/challenges.json is exercised with
+synthesized submissions (the corpus has no reference solutions):
+
+- reference: answers every test case correctly from a lookup table
+- buggy: prints a wrong answer
+- slow / memory_heavy: pathological but correct submissions
+- print_heavy: floods stdout with 100k lines before the answer, so it fails
+  the comparison; it measures the cost of capturing (and capping) output
+
+through three paths: run_single_test_case in-process ("direct", per test
+case), test_code_against_all_cases on a SandboxPool ("pool", per
+submission) and the /api/run-python SSE endpoint ("sse", per request).
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# Measure execution, not the result cache, unless asked otherwise. This must
+# happen before config is imported.
+if "--result-cache" not in sys.argv:
+    os.environ["RESULT_CACHE_ENABLED"] = "false"
+# The sse path imports the app, which would otherwise build a real Gemini
+# client and fail without GEMINI_API_KEY; the benchmark never calls Gemini.
+os.environ["GEMINI_TRANSPORT"] = "synthetic"
+
+import config
+from benchmarks.report import compare_reports, run_metadata, summarize, write_report
+from benchmarks.submissions import SUBMISSION_BODIES, build_submission
+from code_runner import enable_resource_limits, run_single_test_case, test_code_against_all_cases
+from database.challenge_repository import ChallengeRepository
+from runner_pool import SandboxPool
+
+
+def _time_calls(calls: List[Callable[[], Any]]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for call in calls:
+        t0 = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        "count": len(calls),
+        "throughput_per_s": len(calls) / elapsed if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def bench_direct(corpus: Dict[str, List[Dict[str, Any]]], kind: str, iterations: int) -> Dict[str, Any]:
+    calls: List[Callable[[], Any]] = []
+    peaks: List[float] = []
+    for test_cases in corpus.values():
+        code = build_submission(kind, test_cases)
+        for test_case in test_cases:
+            calls.extend([lambda c=code, tc=test_case: run_single_test_case(c, tc)] * iterations)
+            # Memory is sampled in a separate traced run so tracing does not
+            # skew the latency figures.
+            metrics = run_single_test_case(code, test_case, collect_metrics=True).get("metrics")
+            if metrics:
+                peaks.append(metrics["peakMemoryBytes"])
+    result = _time_calls(calls)
+    result["peak_memory_bytes"] = summarize(peaks)
+    return result
+
+
+def bench_pool(
+    corpus: Dict[str, List[Dict[str, Any]]], kind: str, iterations: int, pool: SandboxPool
+) -> Dict[str, Any]:
+    calls: List[Callable[[], Any]] = []
+    for test_cases in corpus.values():
+        code = build_submission(kind, test_cases)
+        calls.extend(
+            [lambda c=code, tcs=test_cases: test_code_against_all_cases(c, tcs, pool=pool)]
+            * iterations
+        )
+    return _time_calls(calls)
+
+
+def bench_sse(
+    corpus: Dict[str, List[Dict[str, Any]]], kind: str, iterations: int, client: Any, parallel: bool
+) -> Dict[str, Any]:
+    def _request(code: str, challenge_id: str, test_cases: List[Dict[str, Any]]) -> None:
+        response = client.post(
+            "/api/run-python",
+            json={
+                "code": code,
+                "testCases": test_cases,
+                "challengeId": challenge_id,
+                "parallel": parallel,
+            },
+        )
+        events = [line for line in response.text.splitlines() if line.startswith("data: ")]
+        if len(events) != len(test_cases):
+            raise RuntimeError(f"Expected {len(test_cases)} events, got {len(events)}")
+
+    calls: List[Callable[[], Any]] = []
+    for challenge_id, test_cases in corpus.items():
+        code = build_submission(kind, test_cases)
+        calls.extend(
+            [lambda c=code, cid=challenge_id, tcs=test_cases: _request(c, cid, tcs)] * iterations
+        )
+    return _time_calls(calls)
+
+
+def load_corpus() -> Dict[str, List[Dict[str, Any]]]:
+    repository = ChallengeRepository()
+    return {
+        challenge.id: [test_case.to_dict() for test_case in challenge.testCases]
+        for challenge in repository.get_all_challenges()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5, help="runs per submission and path")
+    parser.add_argument("--paths", default="direct,pool,sse", help="comma-separated paths to run")
+    parser.add_argument("--kinds", default=",".join(SUBMISSION_BODIES), help="comma-separated submission kinds")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--result-cache", action="store_true", help="keep the result cache enabled")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    paths = [p for p in args.paths.split(",") if p]
+    kinds = [k for k in args.kinds.split(",") if k]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    if "direct" in paths:
+        results["direct"] = {kind: bench_direct(corpus, kind, args.iterations) for kind in kinds}
+
+    if "pool" in paths:
+        pool = SandboxPool(
+            size=config.RUNNER_POOL_SIZE,
+            max_jobs_per_worker=config.RUNNER_MAX_JOBS_PER_WORKER,
+            start_method=config.RUNNER_START_METHOD,
+            job_timeout=config.RUN_TIME_LIMIT_SECONDS + config.RUN_KILL_GRACE_SECONDS,
+            initializer=enable_resource_limits,
+        )
+        pool.start()
+        try:
+            results["pool"] = {kind: bench_pool(corpus, kind, args.iterations, pool) for kind in kinds}
+        finally:
+            pool.shutdown()
+
+    if "sse" in paths:
+        from fastapi.testclient import TestClient
+
+        from app import app
+
+        with TestClient(app) as client:
+            for parallel in (False, True):
+                results["sse_parallel" if parallel else "sse"] = {
+                    kind: bench_sse(corpus, kind, args.iterations, client, parallel) for kind in kinds
+                }
+
+    report = {
+        "meta": {
+            **run_metadata(),
+            "iterations": args.iterations,
+            "challenges": len(corpus),
+            "test_cases": sum(len(tcs) for tcs in corpus.values()),
+            "runner_pool_size": config.RUNNER_POOL_SIZE,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+    for path, by_kind in results.items():
+        for kind, stats in by_kind.items():
+            latency = stats["latency_ms"]
+            print(
+                f"{path:<13} {kind:<13} n={stats['count']:<5} "
+                f"{stats['throughput_per_s']:9.1f}/s  "
+                f"p50={latency['p50']:8.2f}ms p95={latency['p95']:8.2f}ms p99={latency['p99']:8.2f}ms"
+            )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        write_report(report, args.output)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_reports(baseline, report, args.tolerance)
+        if regressions:
+            print("Regressions against", args.compare)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Classroom load test: replay concurrent student sessions against the API.
+
+Needs httpx on top of the app's requirements; run from the backend directory:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.loadtest --stages 5,10,20,40 --stage-duration 30
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --stages 30
+
+Each simulated student lists the challenges, opens one, asks for buggy code,
+runs it, asks for a hint, runs a correct solution and finally requests the
+success explanation (or, sometimes, the retire explanation), with think time
+between steps. Concurrency ramps through ``--stages``; every stage reports
+throughput, tail latency and error rate per endpoint.
+
+Without ``--base-url`` the app runs in-process with GEMINI_FAKE enabled, so
+no network access or API key is needed. To load-test a separately started
+server offline, start it with GEMINI_FAKE=true.
+
+To load-test against real Gemini answers without calling Gemini, record a
+run once against a live server (GEMINI_TRANSPORT=record) and replay it
+in-process with ``--replay benchmarks/cassettes`` (add ``--replay-latency
+zero`` to take Gemini latency out of the picture entirely). Requests that
+were never recorded fail and show up as errors in the report.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.report import run_metadata, summarize, write_report
+from benchmarks.submissions import build_submission
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, endpoint: str, latency_ms: float, ok: bool) -> None:
+        self.latencies.setdefault(endpoint, []).append(latency_ms)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            endpoint: {
+                "count": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "error_rate": self.errors.get(endpoint, 0) / len(values),
+                "throughput_per_s": len(values) / elapsed if elapsed else 0.0,
+                "latency_ms": summarize(values),
+            }
+            for endpoint, values in sorted(self.latencies.items())
+        }
+
+
+async def _call(
+    client: Any,
+    recorder: Recorder,
+    endpoint: str,
+    method: str,
+    url: str,
+    json_body: Optional[Dict[str, Any]] = None,
+) -> Any:
+    started = time.perf_counter()
+    response = None
+    try:
+        response = await client.request(method, url, json=json_body)
+        ok = response.status_code < 400
+    except Exception:
+        ok = False
+    recorder.record(endpoint, (time.perf_counter() - started) * 1000, ok)
+    return response if ok else None
+
+
+def _json(response: Any) -> Dict[str, Any]:
+    try:
+        data = response.json() if response is not None else {}
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def student_session(client: Any, recorder: Recorder, rng: random.Random, think_time: float) -> None:
+    async def _think() -> None:
+        await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+    listing = await _call(client, recorder, "GET /api/challenges", "GET", "/api/challenges")
+    if listing is None:
+        return
+    challenges = listing.json()
+    if not challenges:
+        return
+    challenge_id = rng.choice(challenges)["id"]
+    await _think()
+
+    detail = await _call(
+        client, recorder, "GET /api/challenges/{id}", "GET", f"/api/challenges/{challenge_id}"
+    )
+    if detail is None:
+        return
+    challenge = detail.json()
+    test_cases = challenge["testCases"]
+    await _think()
+
+    generated = _json(
+        await _call(
+            client,
+            recorder,
+            "POST /api/generate-code",
+            "POST",
+            "/api/generate-code",
+            {"challenge": challenge["instructions"], "testCases": test_cases, "challengeId": challenge_id},
+        )
+    )
+    buggy_code = generated.get("code") or build_submission("buggy", test_cases)
+    await _think()
+
+    run_body = {"testCases": test_cases, "challengeId": challenge_id, "parallel": True}
+    await _call(client, recorder, "POST /api/run-python", "POST", "/api/run-python", {**run_body, "code": buggy_code})
+    await _think()
+
+    await _call(
+        client,
+        recorder,
+        "POST /api/generate-hint",
+        "POST",
+        "/api/generate-hint",
+        {
+            "code": buggy_code,
+            "instructions": challenge["instructions"],
+            "examples": challenge["examples"],
+            "testResults": [{"status": "error", "message": "wrong output"}],
+        },
+    )
+    await _think()
+
+    fixed_code = build_submission("reference", test_cases)
+    await _call(client, recorder, "POST /api/run-python", "POST", "/api/run-python", {**run_body, "code": fixed_code})
+    await _think()
+
+    explanation_body = {
+        "beforeCode": buggy_code,
+        "afterCode": fixed_code,
+        "instructions": challenge["instructions"],
+        "examples": challenge["examples"],
+        "testResults": [{"status": "success"}] * len(test_cases),
+    }
+    if rng.random() < 0.2:
+        await _call(
+            client,
+            recorder,
+            "POST /api/generate-retire-explanation",
+            "POST",
+            "/api/generate-retire-explanation",
+            explanation_body,
+        )
+    else:
+        await _call(
+            client,
+            recorder,
+            "POST /api/generate-explanation",
+            "POST",
+            "/api/generate-explanation",
+            explanation_body,
+        )
+
+
+async def run_stage(
+    client: Any, concurrency: int, duration: float, think_time: float, seed: int
+) -> Dict[str, Any]:
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    sessions = 0
+
+    async def _student(index: int) -> None:
+        nonlocal sessions
+        rng = random.Random(seed * 1000 + index)
+        while time.monotonic() < deadline:
+            await student_session(client, recorder, rng, think_time)
+            sessions += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_student(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "sessions": sessions,
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def _print_stage(stage: Dict[str, Any]) -> None:
+    print(f"\n== {stage['concurrency']} students, {stage['sessions']} sessions in {stage['elapsed_s']:.1f}s")
+    for endpoint, stats in stage["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"  {endpoint:<40} n={stats['count']:<5} {stats['throughput_per_s']:7.2f}/s "
+            f"err={stats['error_rate']:6.1%} p50={latency['p50']:8.1f}ms "
+            f"p95={latency['p95']:8.1f}ms p99={latency['p99']:8.1f}ms"
+        )
+
+
+async def _run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import httpx
+
+    stages = [int(s) for s in args.stages.split(",") if s]
+    timeout = httpx.Timeout(args.request_timeout)
+    results: List[Dict[str, Any]] = []
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+            for i, concurrency in enumerate(stages):
+                results.append(await run_stage(client, concurrency, args.stage_duration, args.think_time, i))
+                _print_stage(results[-1])
+        return results
+
+    from app import app
+
+    # ASGITransport does not run the lifespan, so drive it here (it starts
+    # the runner pool).
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            for i, concurrency in enumerate(stages):
+                results.append(await run_stage(client, concurrency, args.stage_duration, args.think_time, i))
+                _print_stage(results[-1])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="5,10,20,40", help="comma-separated concurrent student counts")
+    parser.add_argument("--stage-duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between student actions (s)")
+    parser.add_argument("--request-timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--fake-latency", type=float, default=1.5, help="fake Gemini mean latency (s)")
+    parser.add_argument("--fake-jitter", type=float, default=0.5, help="fake Gemini latency jitter (s)")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0, help="fake Gemini 429 probability")
+    parser.add_argument("--replay", metavar="CASSETTE_DIR", help="replay recorded Gemini responses instead of faking them")
+    parser.add_argument(
+        "--replay-latency", choices=("recorded", "zero"), default="recorded", help="latency of replayed responses"
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        # Must be set before the app (and config) is imported.
+        os.environ["GEMINI_FAKE"] = "true"
+        os.environ["GEMINI_FAKE_LATENCY_SECONDS"] = str(args.fake_latency)
+        os.environ["GEMINI_FAKE_LATENCY_JITTER_SECONDS"] = str(args.fake_jitter)
+        os.environ["GEMINI_FAKE_FAILURE_RATE"] = str(args.fake_failure_rate)
+        os.environ["GEMINI_TRANSPORT"] = "synthetic"
+        # Keep fake variants and solutions out of the real data directory,
+        # where later sessions would hand them to students.
+        store_dir = tempfile.mkdtemp(prefix="loadtest-")
+        os.environ["VARIANT_BANK_PATH"] = os.path.join(store_dir, "variant_bank.json")
+        os.environ["SOLUTION_STORE_PATH"] = os.path.join(store_dir, "solutions.jsonl")
+        if args.replay:
+            os.environ["GEMINI_TRANSPORT"] = "replay"
+            os.environ["GEMINI_CASSETTE_DIR"] = args.replay
+            os.environ["GEMINI_REPLAY_LATENCY"] = args.replay_latency
+
+    stages = asyncio.run(_run(args))
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        report = {
+            "meta": {
+                **run_metadata(),
+                "base_url": args.base_url or "in-process",
+                "think_time": args.think_time,
+                "stage_duration": args.stage_duration,
+                "fake_gemini": None
+                if args.base_url
+                else {"replay": args.replay, "latency": args.replay_latency}
+                if args.replay
+                else {
+                    "latency": args.fake_latency,
+                    "jitter": args.fake_jitter,
+                    "failure_rate": args.fake_failure_rate,
+                },
+            },
+            "stages": stages,
+        }
+        write_report(report, args.output)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+import math
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def run_metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """List every latency percentile that got slower than ``tolerance`` allows.
+
+    Both reports are walked in parallel; any dict holding ``p50``/``p95``/``p99``
+    under a ``latency_ms`` key is compared.
+    """
+    regressions: List[str] = []
+
+    def _walk(base: Any, cur: Any, path: str) -> None:
+        if not isinstance(base, dict) or not isinstance(cur, dict):
+            return
+        for key, base_value in base.items():
+            if key not in cur:
+                continue
+            if key == "latency_ms":
+                for pct in ("p50", "p95", "p99"):
+                    old, new = base_value.get(pct, 0.0), cur[key].get(pct, 0.0)
+                    if old > 0 and new > old * (1 + tolerance):
+                        regressions.append(
+                            f"{path}.{pct}: {old:.2f}ms -> {new:.2f}ms ({new / old - 1:+.0%})"
+                        )
+            else:
+                _walk(base_value, cur[key], f"{path}.{key}" if path else key)
+
+    _walk(baseline.get("results", {}), current.get("results", {}), "")
+    return regressions
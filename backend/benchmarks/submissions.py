@@ -0,0 +1,54 @@
+"""Synthesized submissions for a challenge, built from its test cases.
+
+The challenge corpus has no reference solutions, so every submission embeds
+a lookup table from test-case input to expected output.
+"""
+
+from typing import Any, Dict, List
+
+_LOOKUP_TEMPLATE = """\
+_EXPECTED = {table!r}
+
+
+def _answer(args):
+    return _EXPECTED[repr(list(args))]
+"""
+
+SUBMISSION_BODIES: Dict[str, str] = {
+    "reference": """
+def main(*args):
+    print(_answer(args))
+""",
+    "buggy": """
+def main(*args):
+    print(_answer(args) + "?")
+""",
+    "slow": """
+def main(*args):
+    total = 0
+    for i in range(2_000_000):
+        total += i
+    print(_answer(args))
+""",
+    "print_heavy": """
+def main(*args):
+    for _ in range(100_000):
+        print("noise")
+    print(_answer(args))
+""",
+    "memory_heavy": """
+def main(*args):
+    blob = [0] * 6_000_000
+    print(_answer(args))
+""",
+}
+
+
+def _as_input_list(test_case: Dict[str, Any]) -> List[Any]:
+    value = test_case.get("input", [])
+    return value if isinstance(value, list) else [value]
+
+
+def build_submission(kind: str, test_cases: List[Dict[str, Any]]) -> str:
+    table = {repr(_as_input_list(tc)): str(tc.get("expected")) for tc in test_cases}
+    return _LOOKUP_TEMPLATE.format(table=table) + SUBMISSION_BODIES[kind]
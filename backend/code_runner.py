@@ -1,16 +1,295 @@
+import hashlib
 import io
+import math
+import os
+import signal
+import sys
+import threading
+import time
 import traceback
-from contextlib import redirect_stdout
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 from copy import deepcopy
-from typing import Any, Dict, List
+from types import CodeType
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
 
-def run_single_test_case(code: str, test_case: Dict[str, Any]) -> Dict[str, Any]:
-    stdout_capture: io.StringIO = io.StringIO()
+import config
+from cache import LRUCache
+
+# Compiled submissions keyed by the SHA-256 of their source. Each pool worker
+# has its own copy, so reruns of unchanged code skip parsing and compiling.
+_code_cache = LRUCache(config.CODE_CACHE_SIZE)
+_SUBMISSION_FILENAME = "<string>"
+
+
+def compile_submission(code: str) -> CodeType:
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    code_obj = _code_cache.get(key)
+    if code_obj is None:
+        code_obj = compile(code, _SUBMISSION_FILENAME, "exec")
+        _code_cache.set(key, code_obj)
+    return code_obj
+
+
+class TimeLimitExceeded(BaseException):
+    """Raised inside a submission when it runs past its time budget.
+
+    Derives from BaseException so that ``except Exception`` blocks in
+    student code cannot swallow it.
+    """
+
+
+# Resource limits are only applied inside sandbox worker processes, never in
+# the API process itself (see enable_resource_limits).
+_limits_enabled = False
+
+
+def enable_resource_limits() -> None:
+    """Turn on per-run limits in this process; called once as a pool worker's initializer.
+
+    Per-run limits only lower soft limits, which the submission itself may
+    raise again up to the hard limit. So the hard address-space limit is
+    lowered here, once and for good, to the worker's current size plus
+    twice the per-run budget: a run can never take more than that, and the
+    slack covers what the worker accumulates until it is recycled. Time
+    limits have no such backstop inside the worker (a submission can reset
+    its own timer); the pool's job_timeout kill bounds them instead.
+    """
+    global _limits_enabled
+    _limits_enabled = resource is not None and hasattr(signal, "setitimer")
+    if not _limits_enabled:
+        return
+    address_space = _address_space_bytes()
+    if address_space is None:
+        return
+    cap = address_space + 2 * config.RUN_MEMORY_LIMIT_MB * 1024 * 1024
+    _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+    if as_hard == resource.RLIM_INFINITY or cap < as_hard:
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+
+def _raise_time_limit(signum: int, frame: Any) -> None:
+    raise TimeLimitExceeded()
+
+
+def _address_space_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def _resource_limits() -> Iterator[None]:
+    if not _limits_enabled or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    old_alarm = signal.signal(signal.SIGALRM, _raise_time_limit)
+    old_xcpu = signal.signal(signal.SIGXCPU, _raise_time_limit)
+    cpu_soft, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    as_soft, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+
+    # RLIMIT_CPU and RLIMIT_AS are per-process, so budget relative to what the
+    # worker has already used. Only soft limits are touched so they can be
+    # restored afterwards; the hard cap set by enable_resource_limits stays.
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_budget = math.ceil(usage.ru_utime + usage.ru_stime + config.RUN_CPU_LIMIT_SECONDS)
+    if cpu_hard == resource.RLIM_INFINITY or cpu_budget <= cpu_hard:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_budget, cpu_hard))
+    address_space = _address_space_bytes()
+    if address_space is not None:
+        as_budget = address_space + config.RUN_MEMORY_LIMIT_MB * 1024 * 1024
+        if as_hard == resource.RLIM_INFINITY or as_budget <= as_hard:
+            resource.setrlimit(resource.RLIMIT_AS, (as_budget, as_hard))
+    signal.setitimer(signal.ITIMER_REAL, config.RUN_TIME_LIMIT_SECONDS)
+    try:
+        yield
+    finally:
+        # Disarm first, in its own try: an alarm firing right here must not
+        # skip restoring the limits.
+        try:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        finally:
+            resource.setrlimit(resource.RLIMIT_AS, (as_soft, as_hard))
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+            signal.signal(signal.SIGXCPU, old_xcpu)
+            signal.signal(signal.SIGALRM, old_alarm)
+
+
+def timeout_result() -> Dict[str, Any]:
+    return {
+        "status": "timeout",
+        "message": f"Execution timed out (limit: {config.RUN_TIME_LIMIT_SECONDS:g} seconds).",
+    }
+
+
+def memory_exceeded_result() -> Dict[str, Any]:
+    return {
+        "status": "memory_exceeded",
+        "message": f"Execution exceeded the memory limit ({config.RUN_MEMORY_LIMIT_MB} MB).",
+    }
+
+
+class _OutputCapture(io.TextIOBase):
+    """Collects one execution's stdout and compares it with the expected output.
+
+    Output is compared incrementally as it is written, with the same
+    semantics as ``actual.strip() == expected.strip()``, so only the first
+    ``limit_bytes`` bytes need to be kept for display.
+    """
+
+    def __init__(self, expected: str, limit_bytes: int) -> None:
+        self.expected = expected.strip()
+        self.limit_bytes = limit_bytes
+        self.truncated = False
+        self._chunks: List[str] = []
+        self._size = 0
+        self._started = False
+        self._position = 0
+        self._mismatch = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._keep(text)
+        self._compare(text)
+        return len(text)
+
+    def _keep(self, text: str) -> None:
+        if self.truncated:
+            return
+        encoded = text.encode("utf-8", errors="replace")
+        room = self.limit_bytes - self._size
+        if len(encoded) > room:
+            encoded = encoded[:room]
+            self.truncated = True
+        self._chunks.append(encoded.decode("utf-8", errors="ignore"))
+        self._size += len(encoded)
+
+    def _compare(self, text: str) -> None:
+        if self._mismatch:
+            return
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+        head = text[: len(self.expected) - self._position]
+        if head:
+            if self.expected[self._position : self._position + len(head)] != head:
+                self._mismatch = True
+                return
+            self._position += len(head)
+            text = text[len(head):]
+        # Anything past the expected output may only be trailing whitespace.
+        if text and not text.isspace():
+            self._mismatch = True
+
+    def matches(self) -> bool:
+        return not self._mismatch and self._position == len(self.expected)
+
+    def getvalue(self) -> str:
+        return "".join(self._chunks)
+
+
+class _StdoutRouter(io.TextIOBase):
+    """Process-wide ``sys.stdout`` that sends writes to the current capture.
+
+    The active capture lives in a context variable, so concurrent runs in
+    different threads never see each other's output. Writes outside of a
+    capture go to the original stream.
+    """
+
+    def __init__(self, fallback: TextIO) -> None:
+        self.fallback = fallback
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        capture = _current_capture.get()
+        if capture is None:
+            return self.fallback.write(text)
+        return capture.write(text)
+
+    def flush(self) -> None:
+        if _current_capture.get() is None:
+            self.fallback.flush()
+
+
+_current_capture: ContextVar[Optional[_OutputCapture]] = ContextVar("_current_capture", default=None)
+_router_lock = threading.Lock()
+
+
+@contextmanager
+def _capture_output(capture: _OutputCapture) -> Iterator[None]:
+    with _router_lock:
+        if not isinstance(sys.stdout, _StdoutRouter):
+            sys.stdout = _StdoutRouter(sys.stdout)
+    token = _current_capture.set(capture)
+    try:
+        yield
+    finally:
+        _current_capture.reset(token)
+
+
+@contextmanager
+def _measure(metrics: Dict[str, Any]) -> Iterator[None]:
+    """Record wall time, CPU time, peak traced memory and line events.
+
+    Only lines of the submission itself are counted; frames from the
+    standard library or this module are not traced.
+    """
+    line_events = 0
+
+    def _trace(frame: Any, event: str, arg: Any) -> Any:
+        nonlocal line_events
+        if event == "call":
+            return _trace if frame.f_code.co_filename == _SUBMISSION_FILENAME else None
+        if event == "line":
+            line_events += 1
+        return _trace
+
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    previous_trace = sys.gettrace()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    sys.settrace(_trace)
+    try:
+        yield
+    finally:
+        sys.settrace(previous_trace)
+        metrics["wallTimeMs"] = (time.perf_counter() - wall_start) * 1000
+        metrics["cpuTimeMs"] = (time.thread_time() - cpu_start) * 1000
+        metrics["peakMemoryBytes"] = tracemalloc.get_traced_memory()[1]
+        metrics["lineEvents"] = line_events
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+
+def run_single_test_case(
+    code: str, test_case: Dict[str, Any], collect_metrics: bool = False
+) -> Dict[str, Any]:
+    expected_output = str(test_case.get("expected")).strip()
+    stdout_capture = _OutputCapture(expected_output, config.RUN_OUTPUT_LIMIT_BYTES)
     try:
         namespace: Dict[str, Any] = {}
-        
-        with redirect_stdout(stdout_capture):
+        metrics: Dict[str, Any] = {}
+
+        with _capture_output(stdout_capture):
             # Ensure input_data is a list of arguments for splatting
             input_data_orig = test_case.get("input", [])
             if not isinstance(input_data_orig, list):
@@ -19,46 +298,66 @@ def run_single_test_case(code: str, test_case: Dict[str, Any]) -> Dict[str, Any]
                 input_data_list = input_data_orig
 
             input_data = deepcopy(input_data_list)
-            
-            # Execute the code and check if main function exists
-            exec(code, namespace)
-            solution = namespace.get("main")
-
-            if not callable(solution):
-                return {
-                    "status": "error",
-                    "message": f'Function "main" not found or not callable in code. Found: {type(solution)}',
-                }
-            
-            # Call the main function (this will produce output via print statements)
-            solution(*input_data)
-
-        # Get the captured output and strip trailing whitespace/newlines
+
+            with _resource_limits():
+                # Execute the code and check if main function exists
+                exec(compile_submission(code), namespace)
+                solution = namespace.get("main")
+
+                if not callable(solution):
+                    return {
+                        "status": "error",
+                        "message": f'Function "main" not found or not callable in code. Found: {type(solution)}',
+                    }
+
+                # Call the main function (this will produce output via print statements)
+                with _measure(metrics) if collect_metrics else nullcontext():
+                    solution(*input_data)
+
+        # The output was compared while it was being written; only the
+        # (possibly truncated) displayed copy is stripped here.
         actual_output = stdout_capture.getvalue().strip()
-        expected_output = str(test_case.get("expected")).strip()
-        
-        # Compare the outputs
-        status = "success" if actual_output == expected_output else "error"
-        
+        status = "success" if stdout_capture.matches() else "error"
+
         # Return structured data instead of formatted message
-        return {
+        result: Dict[str, Any] = {
             "status": status,
             "input": input_data_list,
             "expected_output": expected_output,
             "actual_output": actual_output,
+            "truncated": stdout_capture.truncated,
         }
+        if collect_metrics:
+            result["metrics"] = metrics
+        return result
+    except TimeLimitExceeded:
+        return timeout_result()
+    except MemoryError:
+        return memory_exceeded_result()
     except Exception as e:
         return {
             "status": "error",
             "message": f"Error during execution:\n\n{str(e)}\n{traceback.format_exc()}",
         }
+    except BaseException as e:
+        # sys.exit(), KeyboardInterrupt and the like in student code are
+        # ordinary errors, not a reason to take the worker down.
+        return {
+            "status": "error",
+            "message": f"Error during execution:\n\n{type(e).__name__}: {e}\n{traceback.format_exc()}",
+        }
 
 
-def test_code_against_all_cases(code: str, test_cases: List[Dict[str, Any]]) -> bool:
+def test_code_against_all_cases(
+    code: str, test_cases: List[Dict[str, Any]], pool: Optional[Any] = None
+) -> bool:
     if not test_cases:  # If there are no test cases, consider it as passing
         return True
     for test_case in test_cases:
-        result = run_single_test_case(code, test_case)
+        if pool is not None:
+            result = pool.submit_test_case(code, test_case).result()
+        else:
+            result = run_single_test_case(code, test_case)
         if result.get("status") != "success":
             return False
     return True
@@ -10,6 +10,98 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # Gemini API Configuration
 GEMINI_MODEL_NAME = "gemini-2.0-flash"
 GEMINI_TEMPERATURE = 0.5
+# Maximum concurrent Gemini requests across all endpoints
+GEMINI_MAX_IN_FLIGHT: int = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", "64"))
+# Upstream request rate (token bucket) and how far it may burst above it
+GEMINI_RATE_LIMIT_PER_MINUTE: float = float(os.environ.get("GEMINI_RATE_LIMIT_PER_MINUTE", "1000"))
+GEMINI_RATE_LIMIT_BURST: int = int(os.environ.get("GEMINI_RATE_LIMIT_BURST", "20"))
+# Waiting Gemini requests beyond this are answered with 503 and Retry-After
+GEMINI_MAX_QUEUE: int = int(os.environ.get("GEMINI_MAX_QUEUE", "256"))
+# Retries of 429/5xx responses with jittered exponential backoff
+GEMINI_MAX_RETRIES: int = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BASE_SECONDS: float = float(os.environ.get("GEMINI_RETRY_BASE_SECONDS", "0.5"))
+GEMINI_RETRY_MAX_SECONDS: float = float(os.environ.get("GEMINI_RETRY_MAX_SECONDS", "8"))
+# Estimated token budget of one prompt, and caps on its variable parts
+PROMPT_TOKEN_BUDGET: int = int(os.environ.get("PROMPT_TOKEN_BUDGET", "6000"))
+PROMPT_MAX_INSTRUCTIONS_TOKENS: int = int(os.environ.get("PROMPT_MAX_INSTRUCTIONS_TOKENS", "1500"))
+PROMPT_MAX_EXAMPLES_TOKENS: int = int(os.environ.get("PROMPT_MAX_EXAMPLES_TOKENS", "800"))
+PROMPT_MAX_CODE_TOKENS: int = int(os.environ.get("PROMPT_MAX_CODE_TOKENS", "1500"))
+PROMPT_MAX_TEST_RESULTS_TOKENS: int = int(os.environ.get("PROMPT_MAX_TEST_RESULTS_TOKENS", "1200"))
+# Traceback frames of the submission kept per failing test case
+PROMPT_MAX_TRACEBACK_FRAMES: int = int(os.environ.get("PROMPT_MAX_TRACEBACK_FRAMES", "3"))
+# Let identical concurrent Gemini requests share one upstream call
+GEMINI_COALESCE_REQUESTS: bool = os.environ.get("GEMINI_COALESCE_REQUESTS", "true").lower() == "true"
+
+# Offline Gemini stand-in for load tests (see gemini_fake.py)
+GEMINI_FAKE: bool = os.environ.get("GEMINI_FAKE", "false").lower() == "true"
+GEMINI_FAKE_LATENCY_SECONDS: float = float(os.environ.get("GEMINI_FAKE_LATENCY_SECONDS", "1.5"))
+GEMINI_FAKE_LATENCY_JITTER_SECONDS: float = float(os.environ.get("GEMINI_FAKE_LATENCY_JITTER_SECONDS", "0.5"))
+GEMINI_FAKE_FAILURE_RATE: float = float(os.environ.get("GEMINI_FAKE_FAILURE_RATE", "0"))
+# Gemini transport: live, record, replay or synthetic (see gemini_cassette.py).
+# "synthetic" is the fake client above; GEMINI_FAKE=true is kept as its alias.
+GEMINI_TRANSPORT: str = os.environ.get("GEMINI_TRANSPORT", "synthetic" if GEMINI_FAKE else "live").lower()
+GEMINI_CASSETTE_DIR: str = os.environ.get("GEMINI_CASSETTE_DIR", "benchmarks/cassettes")
+# Replay with the latency measured while recording, or "zero" to answer immediately
+GEMINI_REPLAY_LATENCY: str = os.environ.get("GEMINI_REPLAY_LATENCY", "recorded").lower()
+
+# Code runner worker pool (0 runs submissions inside the API process)
+RUNNER_POOL_SIZE: int = int(os.environ.get("RUNNER_POOL_SIZE", os.cpu_count() or 2))
+RUNNER_MAX_JOBS_PER_WORKER: int = int(os.environ.get("RUNNER_MAX_JOBS_PER_WORKER", "200"))
+RUNNER_START_METHOD: str = os.environ.get("RUNNER_START_METHOD", "forkserver")
+# Per-test-case limits enforced inside the worker processes
+RUN_TIME_LIMIT_SECONDS: float = float(os.environ.get("RUN_TIME_LIMIT_SECONDS", "5"))
+RUN_CPU_LIMIT_SECONDS: int = int(os.environ.get("RUN_CPU_LIMIT_SECONDS", "5"))
+RUN_MEMORY_LIMIT_MB: int = int(os.environ.get("RUN_MEMORY_LIMIT_MB", "256"))
+# Bytes of stdout kept per test case (output beyond this is still compared)
+RUN_OUTPUT_LIMIT_BYTES: int = int(os.environ.get("RUN_OUTPUT_LIMIT_BYTES", "65536"))
+# Extra time before a worker that ignores its time limit is killed
+RUN_KILL_GRACE_SECONDS: float = float(os.environ.get("RUN_KILL_GRACE_SECONDS", "2"))
+# Run a request's test cases concurrently unless the client asks otherwise
+RUN_PARALLEL_DEFAULT: bool = os.environ.get("RUN_PARALLEL_DEFAULT", "false").lower() == "true"
+# Upper bound on concurrently running test cases of a single request
+RUN_MAX_PARALLEL_CASES: int = int(os.environ.get("RUN_MAX_PARALLEL_CASES", "4"))
+# How often streaming endpoints check whether the client went away
+DISCONNECT_POLL_SECONDS: float = float(os.environ.get("DISCONNECT_POLL_SECONDS", "0.5"))
+# Measure every run that names its challenge, feeding the per-challenge
+# histograms even when the client did not ask for metrics in the payload
+RUN_COLLECT_METRICS: bool = os.environ.get("RUN_COLLECT_METRICS", "false").lower() == "true"
+# Upper bound on validating one generated candidate against all test cases
+CANDIDATE_VALIDATION_TIMEOUT_SECONDS: float = float(
+    os.environ.get("CANDIDATE_VALIDATION_TIMEOUT_SECONDS", "15")
+)
+# Maximum number of submissions accepted by one batch grading request
+BATCH_MAX_SUBMISSIONS: int = int(os.environ.get("BATCH_MAX_SUBMISSIONS", "200"))
+# Number of compiled submissions kept per process
+CODE_CACHE_SIZE: int = int(os.environ.get("CODE_CACHE_SIZE", "256"))
+# Reuse results of identical (code, test case) runs
+RESULT_CACHE_ENABLED: bool = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_SIZE: int = int(os.environ.get("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_TTL_SECONDS: float = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "600"))
+# Reuse hints for the same challenge, normalized code and test status pattern
+HINT_CACHE_ENABLED: bool = os.environ.get("HINT_CACHE_ENABLED", "true").lower() == "true"
+HINT_CACHE_SIZE: int = int(os.environ.get("HINT_CACHE_SIZE", "2048"))
+# Pre-validated buggy variants served by /api/generate-code (see variant_bank.py)
+VARIANT_BANK_ENABLED: bool = os.environ.get("VARIANT_BANK_ENABLED", "true").lower() == "true"
+VARIANT_BANK_PATH: str = os.environ.get("VARIANT_BANK_PATH", "database/data/variant_bank.json")
+# Variants kept per challenge, and the stock below which a refill starts
+VARIANT_BANK_TARGET_SIZE: int = int(os.environ.get("VARIANT_BANK_TARGET_SIZE", "6"))
+VARIANT_BANK_LOW_WATERMARK: int = int(os.environ.get("VARIANT_BANK_LOW_WATERMARK", "2"))
+# Gemini calls one refill may spend before giving up on reaching the target
+VARIANT_BANK_MAX_REFILL_ATTEMPTS: int = int(os.environ.get("VARIANT_BANK_MAX_REFILL_ATTEMPTS", "3"))
+# Challenge storage: "json" (database/data/challenges.json), "journal" (the same
+# file plus an append-only journal) or "sqlite"
+CHALLENGE_BACKEND: str = os.environ.get("CHALLENGE_BACKEND", "json").lower()
+CHALLENGE_JSON_PATH: str = os.environ.get("CHALLENGE_JSON_PATH", "database/data/challenges.json")
+# Journal records after which the journal is folded into challenges.json
+CHALLENGE_JOURNAL_COMPACT_AFTER: int = int(os.environ.get("CHALLENGE_JOURNAL_COMPACT_AFTER", "100"))
+# Seeded from CHALLENGE_JSON_PATH when it does not exist yet
+CHALLENGE_DB_PATH: str = os.environ.get("CHALLENGE_DB_PATH", "database/data/challenges.db")
+# Pre-serialized challenge responses kept in memory (see database/challenge_store.py)
+CHALLENGE_STORE_MAX_BYTES: int = int(os.environ.get("CHALLENGE_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Fixed code and explanation of handed-out variants, reused by the retire explanation
+SOLUTION_STORE_ENABLED: bool = os.environ.get("SOLUTION_STORE_ENABLED", "true").lower() == "true"
+SOLUTION_STORE_PATH: str = os.environ.get("SOLUTION_STORE_PATH", "database/data/solutions.jsonl")
+SOLUTION_STORE_MAX_ENTRIES: int = int(os.environ.get("SOLUTION_STORE_MAX_ENTRIES", "5000"))
 
 SYSTEM_INSTRUCTION: str = """\
 <references>
@@ -135,3 +227,34 @@ Constraints:
 - AI生成コードが存在しない場合は、学習者の最新コードと課題説明を中心に分析する。
 - JSON 以外のテキストは出力しない。
 """
+
+RETIRE_ADVICE_SYSTEM_INSTRUCTION: str = """\
+あなたは優しく寄り添うプログラミングの先生です。
+学習者は今回の課題をリタイアしました。正解コードとその解説はすでに学習者に示されています。
+学習者のコードと正解コードを比べ、次につなげる前向きなアドバイスだけを書いてください。
+
+## 入力
+- 課題の説明
+- 課題の例
+- AI生成コード（学習者が修正の出発点としたコード）
+- 正解コードとその解説
+- 学習者の最新コード（修正後のコード）
+- テスト結果
+
+## 出力形式
+以下のJSON形式で出力してください。
+```json
+{
+  "advice": "string"  // 学習者への励ましと実践的アドバイス
+}
+```
+
+Constraints:
+- 出力は必ず日本語。
+- 文体はやさしく励ますトーン。
+- 正解コードや解説を繰り返さない。
+- AI生成コードと学習者コードが同一なら「手を付けられていない」と判断する。
+- 学習者のコードのどこが正解に近づいていて、どこが足りないかを具体的に示す。
+- 次にどう行動すればよいかを実践的に示す。
+- JSON 以外のテキストは出力しない。
+"""
@@ -1,6 +1,6 @@
 import json
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from database.models.challenge import Challenge
 
 
@@ -26,6 +26,14 @@ class ChallengeRepository:
         with open(self.data_file_path, 'w', encoding='utf-8') as file:
             json.dump(challenges_data, file, ensure_ascii=False, indent=2)
 
+    def change_signature(self) -> Optional[Tuple[int, ...]]:
+        """Changes whenever the stored catalog may have changed (mtime and size of the file)."""
+        try:
+            stat = os.stat(self.data_file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def get_all_challenges(self) -> List[Challenge]:
         challenges_data = self._load_challenges()
         return [Challenge.from_dict(data) for data in challenges_data]
@@ -70,4 +78,23 @@ class ChallengeRepository:
                 self._save_challenges(challenges_data)
                 return True
         
-        return False
\ No newline at end of file
+        return False
+
+
+def create_challenge_repository() -> ChallengeRepository:
+    """The repository selected by config.CHALLENGE_BACKEND."""
+    import config
+
+    if config.CHALLENGE_BACKEND == "sqlite":
+        from database.sqlite_challenge_repository import SQLiteChallengeRepository
+
+        return SQLiteChallengeRepository(config.CHALLENGE_DB_PATH, seed_json_path=config.CHALLENGE_JSON_PATH)
+    if config.CHALLENGE_BACKEND == "journal":
+        from database.journaled_challenge_repository import JournaledChallengeRepository
+
+        return JournaledChallengeRepository(
+            config.CHALLENGE_JSON_PATH, compact_after=config.CHALLENGE_JOURNAL_COMPACT_AFTER
+        )
+    if config.CHALLENGE_BACKEND != "json":
+        raise ValueError(f"Unknown CHALLENGE_BACKEND {config.CHALLENGE_BACKEND!r}")
+    return ChallengeRepository(config.CHALLENGE_JSON_PATH)
@@ -0,0 +1,153 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.challenge_repository import ChallengeRepository
+from database.models.challenge import Challenge
+from metrics import Counter, Gauge
+
+challenge_store_lookups = Counter(
+    "challenge_store_lookups_total",
+    "Challenge reads by whether pre-serialized bytes were served (hit) or built (miss)",
+    labelnames=("kind", "result"),
+)
+challenge_store_reloads = Counter(
+    "challenge_store_reloads_total",
+    "Catalog reloads after the stored challenges changed",
+)
+challenge_store_bytes = Gauge(
+    "challenge_store_cached_bytes",
+    "Pre-serialized response bytes held by the challenge store",
+)
+
+
+def _serialize(content: Any) -> bytes:
+    # Same encoding as starlette's JSONResponse.
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+class ChallengeStore:
+    """In-memory, indexed view of a ChallengeRepository.
+
+    Reads are dictionary lookups; the catalog is reloaded only when the
+    repository's change signature (e.g. the data file's mtime and size) changes,
+    or after a write through the store.
+    Response bodies are kept pre-serialized, the whole list first and then
+    single challenges, within ``max_bytes``; beyond that single challenges
+    are serialized on demand and the least recently used ones evicted.
+    """
+
+    def __init__(self, repository: ChallengeRepository, max_bytes: int = 32 * 1024 * 1024):
+        self.repository = repository
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, ...]] = None
+        self._challenges: List[Challenge] = []
+        self._index: Dict[str, Challenge] = {}
+        self._list_bytes: Optional[bytes] = None
+        self._bytes: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached_bytes = 0
+
+    def _refresh(self) -> None:
+        """Reload the catalog if the repository changed. Caller holds the lock."""
+        signature = self.repository.change_signature()
+        if signature == self._signature and signature is not None:
+            return
+        challenges = self.repository.get_all_challenges()
+        self._signature = signature
+        self._challenges = challenges
+        self._index = {challenge.id: challenge for challenge in challenges}
+        self._bytes.clear()
+        self._cached_bytes = 0
+        list_bytes = _serialize([challenge.to_dict() for challenge in challenges])
+        self._list_bytes = list_bytes if len(list_bytes) <= self.max_bytes else None
+        self._cached_bytes = len(self._list_bytes or b"")
+        for challenge in challenges:
+            body = _serialize(challenge.to_dict())
+            if self._cached_bytes + len(body) > self.max_bytes:
+                break
+            self._bytes[challenge.id] = body
+            self._cached_bytes += len(body)
+        challenge_store_reloads.inc()
+        challenge_store_bytes.set(self._cached_bytes)
+
+    def _remember(self, challenge_id: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        self._bytes[challenge_id] = body
+        self._cached_bytes += len(body)
+        while self._cached_bytes > self.max_bytes and self._bytes:
+            _, evicted = self._bytes.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+        challenge_store_bytes.set(self._cached_bytes)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+
+    def get_all_challenges(self) -> List[Challenge]:
+        with self._lock:
+            self._refresh()
+            return list(self._challenges)
+
+    def get_challenge_by_id(self, challenge_id: str) -> Optional[Challenge]:
+        with self._lock:
+            self._refresh()
+            return self._index.get(challenge_id)
+
+    def get_all_challenges_json(self) -> bytes:
+        with self._lock:
+            self._refresh()
+            if self._list_bytes is not None:
+                challenge_store_lookups.inc(kind="list", result="hit")
+                return self._list_bytes
+            challenges = list(self._challenges)
+        challenge_store_lookups.inc(kind="list", result="miss")
+        return _serialize([challenge.to_dict() for challenge in challenges])
+
+    def get_challenge_json(self, challenge_id: str) -> Optional[bytes]:
+        """Response body for one challenge, or None when there is no such challenge."""
+        with self._lock:
+            self._refresh()
+            body = self._bytes.get(challenge_id)
+            if body is not None:
+                self._bytes.move_to_end(challenge_id)
+                challenge_store_lookups.inc(kind="challenge", result="hit")
+                return body
+            challenge = self._index.get(challenge_id)
+            if challenge is None:
+                return None
+            body = _serialize(challenge.to_dict())
+            self._remember(challenge_id, body)
+        challenge_store_lookups.inc(kind="challenge", result="miss")
+        return body
+
+    def create_challenge(self, challenge: Challenge) -> Challenge:
+        try:
+            return self.repository.create_challenge(challenge)
+        finally:
+            self.invalidate()
+
+    def update_challenge(self, challenge_id: str, challenge: Challenge) -> Optional[Challenge]:
+        try:
+            return self.repository.update_challenge(challenge_id, challenge)
+        finally:
+            self.invalidate()
+
+    def delete_challenge(self, challenge_id: str) -> bool:
+        try:
+            return self.repository.delete_challenge(challenge_id)
+        finally:
+            self.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "challenges": len(self._index),
+                "cachedBytes": self._cached_bytes,
+                "maxBytes": self.max_bytes,
+                "cachedChallenges": len(self._bytes),
+            }
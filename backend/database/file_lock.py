@@ -0,0 +1,26 @@
+import fcntl
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class FileLock:
+    """Lock shared by the threads of this process and, through fcntl, by other processes.
+
+    flock alone does not exclude threads using the same open file, hence the
+    thread lock around it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._file = open(path, "a+")
+
+    @contextmanager
+    def hold(self, exclusive: bool = True) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
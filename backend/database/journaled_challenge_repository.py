@@ -0,0 +1,189 @@
+"""Append-only journal on top of the JSON challenge catalog.
+
+Mutations are appended to ``<catalog>.journal`` as JSON lines and fsynced,
+so a write costs one record and a crash loses at most the record being
+written. Readers apply the journal on top of the snapshot (the plain
+``challenges.json``, which stays readable by the JSON backend). Once the
+journal holds ``compact_after`` records, a background thread folds it into
+a new snapshot that replaces the old one by rename, then empties the
+journal. Journal records are idempotent upserts and deletes, so a crash
+between those two steps only replays records already in the snapshot.
+
+All access takes an fcntl lock on ``<catalog>.lock``, so several uvicorn
+workers can share one data directory.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from database.challenge_repository import ChallengeRepository
+from database.models.challenge import Challenge
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournaledChallengeRepository(ChallengeRepository):
+    def __init__(self, data_file_path: str = "database/data/challenges.json", compact_after: int = 100):
+        super().__init__(data_file_path)
+        self.journal_path = f"{data_file_path}.journal"
+        self.lock_path = f"{data_file_path}.lock"
+        self.compact_after = compact_after
+        self._thread_lock = threading.RLock()
+        self._lock_file = open(self.lock_path, "a+")
+        self._compactor: Optional[threading.Thread] = None
+        # Catalog as of _cached_signature, so writers need not re-read it.
+        self._cached: Optional[List[Dict[str, Any]]] = None
+        self._cached_signature: Optional[Tuple[int, ...]] = None
+        self._journal_records = 0
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def change_signature(self) -> Optional[Tuple[int, ...]]:
+        """mtime and size of both the snapshot and the journal."""
+        signature: List[int] = []
+        for path in (self.data_file_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.extend((0, 0))
+                continue
+            signature.extend((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        records = []
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A record torn by a crash mid-append; it was never acknowledged.
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    @staticmethod
+    def _apply(challenges_data: List[Dict[str, Any]], record: Dict[str, Any]) -> None:
+        if record["op"] == "put":
+            data = record["challenge"]
+            for i, existing in enumerate(challenges_data):
+                if existing["id"] == data["id"]:
+                    challenges_data[i] = data
+                    return
+            challenges_data.append(data)
+        elif record["op"] == "delete":
+            challenges_data[:] = [c for c in challenges_data if c["id"] != record["id"]]
+
+    def _load_challenges(self) -> List[Dict[str, Any]]:
+        """Snapshot plus journal. Caller holds the lock."""
+        signature = self.change_signature()
+        if self._cached is not None and signature == self._cached_signature:
+            return [dict(data) for data in self._cached]
+        challenges_data = super()._load_challenges()
+        records = self._read_journal()
+        for record in records:
+            self._apply(challenges_data, record)
+        self._cached = challenges_data
+        self._cached_signature = signature
+        self._journal_records = len(records)
+        return [dict(data) for data in challenges_data]
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Durably append one record. Caller holds the exclusive lock and has loaded the catalog."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab+") as file:
+            # Drop a torn tail left by a crash so this record starts on its own line.
+            size = file.seek(0, os.SEEK_END)
+            if size:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    file.seek(0)
+                    content = file.read()
+                    file.truncate(content.rfind(b"\n") + 1)
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self._apply(self._cached, record)  # type: ignore[arg-type]
+        self._cached_signature = self.change_signature()
+        self._journal_records += 1
+        if self._journal_records >= self.compact_after:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compactor.start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as exc:
+            print(f"Challenge journal compaction failed: {exc}")
+
+    def compact(self) -> None:
+        """Fold the journal into a new snapshot and empty it."""
+        with self._locked(exclusive=True):
+            challenges_data = self._load_challenges()
+            if not self._journal_records:
+                return
+            tmp_path = f"{self.data_file_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(challenges_data, file, ensure_ascii=False, indent=2)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.data_file_path)
+            _fsync_directory(self.data_file_path)
+            with open(self.journal_path, "wb") as file:
+                os.fsync(file.fileno())
+            self._cached_signature = self.change_signature()
+            self._journal_records = 0
+
+    def get_all_challenges(self) -> List[Challenge]:
+        with self._locked(exclusive=False):
+            return super().get_all_challenges()
+
+    def get_challenge_by_id(self, challenge_id: str) -> Optional[Challenge]:
+        with self._locked(exclusive=False):
+            return super().get_challenge_by_id(challenge_id)
+
+    def create_challenge(self, challenge: Challenge) -> Challenge:
+        with self._locked(exclusive=True):
+            if any(c["id"] == challenge.id for c in self._load_challenges()):
+                raise ValueError(f"Challenge with ID '{challenge.id}' already exists")
+            self._append({"op": "put", "challenge": challenge.to_dict()})
+            return challenge
+
+    def update_challenge(self, challenge_id: str, challenge: Challenge) -> Optional[Challenge]:
+        with self._locked(exclusive=True):
+            if not any(c["id"] == challenge_id for c in self._load_challenges()):
+                return None
+            challenge.id = challenge_id
+            self._append({"op": "put", "challenge": challenge.to_dict()})
+            return challenge
+
+    def delete_challenge(self, challenge_id: str) -> bool:
+        with self._locked(exclusive=True):
+            if not any(c["id"] == challenge_id for c in self._load_challenges()):
+                return False
+            self._append({"op": "delete", "id": challenge_id})
+            return True
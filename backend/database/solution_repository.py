@@ -0,0 +1,106 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from database.file_lock import FileLock
+from fingerprint import code_fingerprint
+
+
+class SolutionRepository:
+    """Fixed code and explanation of every buggy variant handed out.
+
+    Keyed by ``code_fingerprint`` of the buggy code, so a learner's
+    ``beforeCode`` still matches after formatting changes. The file is an
+    append-only JSON-lines log of ``{key, fixed_code, explanation,
+    challengeId, createdAt}`` records: a write appends one record under a
+    file lock, and readers pick up records appended by other workers by
+    reading from where they left off. Only the latest ``max_entries`` are
+    kept; once the log holds twice that, it is compacted by rename.
+    """
+
+    def __init__(self, data_file_path: str = "database/data/solutions.jsonl", max_entries: int = 5000):
+        self.data_file_path = data_file_path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(data_file_path) or ".", exist_ok=True)
+        self._lock = FileLock(f"{data_file_path}.lock")
+        self._solutions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._records = 0
+        # (inode, offset) of the log as read so far.
+        self._position: Tuple[int, int] = (0, 0)
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        key = record.pop("key")
+        self._solutions.pop(key, None)
+        self._solutions[key] = record
+        while len(self._solutions) > self.max_entries:
+            self._solutions.popitem(last=False)
+        self._records += 1
+
+    def _refresh(self) -> None:
+        """Read records appended since the last call. Caller holds the lock."""
+        try:
+            stat = os.stat(self.data_file_path)
+        except OSError:
+            return
+        inode, offset = self._position
+        if stat.st_ino != inode or stat.st_size < offset:
+            # Compacted by another process: read it again from the start.
+            self._solutions.clear()
+            self._records = 0
+            offset = 0
+        if stat.st_size == offset:
+            self._position = (stat.st_ino, offset)
+            return
+        with open(self.data_file_path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # Being appended right now; read it next time.
+                    break
+                offset += len(line)
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        self._position = (stat.st_ino, offset)
+
+    def _compact(self) -> None:
+        """Rewrite the log with the live entries only. Caller holds the lock."""
+        tmp_path = f"{self.data_file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for key, solution in self._solutions.items():
+                file.write(json.dumps({"key": key, **solution}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.data_file_path)
+        stat = os.stat(self.data_file_path)
+        self._position = (stat.st_ino, stat.st_size)
+        self._records = len(self._solutions)
+
+    def __len__(self) -> int:
+        with self._lock.hold(exclusive=False):
+            self._refresh()
+            return len(self._solutions)
+
+    def get_solution(self, code: str) -> Optional[Dict[str, Any]]:
+        if not code.strip():
+            return None
+        key = code_fingerprint(code)
+        with self._lock.hold(exclusive=False):
+            self._refresh()
+            solution = self._solutions.get(key)
+            return dict(solution) if solution is not None else None
+
+    def add_solution(self, code: str, solution: Dict[str, Any]) -> bool:
+        """Store ``solution`` for ``code`` unless it has no fixed code; returns whether it was stored."""
+        if not code.strip() or not solution.get("fixed_code"):
+            return False
+        record = {"key": code_fingerprint(code), **solution}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock.hold():
+            self._refresh()
+            with open(self.data_file_path, 'a', encoding='utf-8') as file:
+                file.write(line)
+            self._refresh()
+            if self._records >= 2 * self.max_entries:
+                self._compact()
+        return True
@@ -0,0 +1,189 @@
+"""SQLite storage for challenges, behind the ChallengeRepository interface.
+
+Each challenge is one row, so a write costs one record instead of a rewrite
+of the whole catalog, and concurrent writers are serialized by SQLite
+transactions. Select it with CHALLENGE_BACKEND=sqlite; when the schema is
+first created the database is seeded from the JSON catalog, in the same
+transaction, so a failed seed is retried on the next start. To (re-)import
+by hand, from the backend directory:
+
+    python -m database.sqlite_challenge_repository --import database/data/challenges.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.challenge_repository import ChallengeRepository
+from database.models.challenge import Challenge
+
+# Applied in order; PRAGMA user_version records how many have run.
+_MIGRATIONS: List[str] = [
+    """
+    CREATE TABLE challenges (
+        id TEXT PRIMARY KEY,
+        difficulty TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX idx_challenges_difficulty ON challenges (difficulty);
+    """,
+]
+
+
+class SQLiteChallengeRepository(ChallengeRepository):
+    """Challenges in an SQLite database in WAL mode.
+
+    ``data`` holds ``Challenge.to_dict()`` as JSON; ``id`` (primary key) and
+    ``difficulty`` are indexed columns. Rows keep their insertion order.
+    Connections are per thread.
+    """
+
+    def __init__(self, db_path: str = "database/data/challenges.db", seed_json_path: Optional[str] = None):
+        self.seed_json_path = seed_json_path
+        self._local = threading.local()
+        super().__init__(db_path)
+
+    def _ensure_data_file_exists(self) -> None:
+        os.makedirs(os.path.dirname(self.data_file_path) or ".", exist_ok=True)
+        self._migrate()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.data_file_path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=10000")
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for i, migration in enumerate(_MIGRATIONS[version:], start=version + 1):
+                for statement in migration.split(";"):
+                    if statement.strip():
+                        connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {i}")
+            if version == 0 and self.seed_json_path and os.path.exists(self.seed_json_path):
+                self._import_rows(connection, self.seed_json_path)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _write(self, statement: str, parameters: Tuple[Any, ...]) -> int:
+        """Run one write in its own transaction; returns the number of rows changed."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            changed = connection.execute(statement, parameters).rowcount
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return changed
+
+    def change_signature(self) -> Optional[Tuple[int, ...]]:
+        """Changes whenever another connection commits (mtime and size of the database and its WAL)."""
+        signature: List[int] = []
+        for path in (self.data_file_path, f"{self.data_file_path}-wal"):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.extend((0, 0))
+                continue
+            signature.extend((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get_all_challenges(self) -> List[Challenge]:
+        rows = self._connection().execute("SELECT data FROM challenges ORDER BY rowid").fetchall()
+        return [Challenge.from_dict(json.loads(data)) for (data,) in rows]
+
+    def get_challenges_by_difficulty(self, difficulty: str) -> List[Challenge]:
+        rows = (
+            self._connection()
+            .execute("SELECT data FROM challenges WHERE difficulty = ? ORDER BY rowid", (difficulty,))
+            .fetchall()
+        )
+        return [Challenge.from_dict(json.loads(data)) for (data,) in rows]
+
+    def get_challenge_by_id(self, challenge_id: str) -> Optional[Challenge]:
+        row = self._connection().execute("SELECT data FROM challenges WHERE id = ?", (challenge_id,)).fetchone()
+        return Challenge.from_dict(json.loads(row[0])) if row else None
+
+    def create_challenge(self, challenge: Challenge) -> Challenge:
+        try:
+            self._write(
+                "INSERT INTO challenges (id, difficulty, data) VALUES (?, ?, ?)",
+                (challenge.id, challenge.difficulty, json.dumps(challenge.to_dict(), ensure_ascii=False)),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Challenge with ID '{challenge.id}' already exists") from None
+        return challenge
+
+    def update_challenge(self, challenge_id: str, challenge: Challenge) -> Optional[Challenge]:
+        challenge.id = challenge_id
+        changed = self._write(
+            "UPDATE challenges SET difficulty = ?, data = ? WHERE id = ?",
+            (challenge.difficulty, json.dumps(challenge.to_dict(), ensure_ascii=False), challenge_id),
+        )
+        return challenge if changed else None
+
+    def delete_challenge(self, challenge_id: str) -> bool:
+        return self._write("DELETE FROM challenges WHERE id = ?", (challenge_id,)) > 0
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+
+    @staticmethod
+    def _import_rows(connection: sqlite3.Connection, json_path: str) -> int:
+        """Upsert every challenge of a JSON catalog. Caller holds a transaction."""
+        with open(json_path, 'r', encoding='utf-8') as file:
+            challenges_data: List[Dict[str, Any]] = json.load(file)
+        rows = []
+        for data in challenges_data:
+            challenge = Challenge.from_dict(data)
+            rows.append((challenge.id, challenge.difficulty, json.dumps(challenge.to_dict(), ensure_ascii=False)))
+        connection.executemany(
+            "INSERT INTO challenges (id, difficulty, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET difficulty = excluded.difficulty, data = excluded.data",
+            rows,
+        )
+        return len(rows)
+
+    def import_json(self, json_path: str) -> int:
+        """Insert or replace every challenge of a JSON catalog in one transaction; returns how many."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            imported = self._import_rows(connection, json_path)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return imported
+
+
+def main() -> None:
+    import config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=config.CHALLENGE_DB_PATH, help="SQLite database path")
+    parser.add_argument("--import", dest="import_path", metavar="JSON", help="import a JSON challenge catalog")
+    args = parser.parse_args()
+
+    repository = SQLiteChallengeRepository(args.db)
+    if args.import_path:
+        imported = repository.import_json(args.import_path)
+        print(f"Imported {imported} challenges into {args.db}")
+    print(f"{repository.count()} challenges in {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.file_lock import FileLock
+
+
+class VariantRepository:
+    """Buggy variants per challenge, stored as ``{challenge_id: [variant, ...]}``.
+
+    Each variant is a dict with ``code``, ``fixed_code``, ``explanation``,
+    ``createdAt`` and ``challengeKey``, a fingerprint of the challenge it was
+    validated against; passing the current key to ``count`` and
+    ``pop_random_variant`` skips variants made for an older version of the
+    challenge. The whole file is rewritten on every change through a
+    temporary file so a crash never leaves it half-written. Every access
+    reloads the file first if its mtime or size changed, and changes are
+    made under a file lock, so a prewarm run or another worker sharing the
+    file is seen and never overwritten with a stale copy.
+    """
+
+    def __init__(self, data_file_path: str = "database/data/variant_bank.json"):
+        self.data_file_path = data_file_path
+        os.makedirs(os.path.dirname(data_file_path) or ".", exist_ok=True)
+        self._lock = FileLock(f"{data_file_path}.lock")
+        self._signature: Optional[Tuple[int, int]] = None
+        self._variants: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.data_file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        """Reload the file if someone else changed it. Caller holds the lock."""
+        signature = self._file_signature()
+        if signature is not None and signature == self._signature:
+            return
+        self._variants = self._load_variants()
+        self._signature = signature
+
+    def _load_variants(self) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            with open(self.data_file_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save_variants(self) -> None:
+        tmp_path = f"{self.data_file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._variants, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.data_file_path)
+        self._signature = self._file_signature()
+
+    def _matching(self, challenge_id: str, challenge_key: Optional[str]) -> List[Dict[str, Any]]:
+        banked = self._variants.get(challenge_id, [])
+        if challenge_key is None:
+            return list(banked)
+        return [variant for variant in banked if variant.get("challengeKey") == challenge_key]
+
+    def count(self, challenge_id: str, challenge_key: Optional[str] = None) -> int:
+        with self._lock.hold(exclusive=False):
+            self._refresh()
+            return len(self._matching(challenge_id, challenge_key))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock.hold(exclusive=False):
+            self._refresh()
+            return {challenge_id: len(variants) for challenge_id, variants in self._variants.items()}
+
+    def get_variants(self, challenge_id: str) -> List[Dict[str, Any]]:
+        with self._lock.hold(exclusive=False):
+            self._refresh()
+            return list(self._variants.get(challenge_id, []))
+
+    def add_variants(self, challenge_id: str, variants: List[Dict[str, Any]]) -> int:
+        """Append variants whose code is not banked yet; returns how many were added."""
+        with self._lock.hold():
+            self._refresh()
+            banked = self._variants.setdefault(challenge_id, [])
+            known = {variant["code"] for variant in banked}
+            added = 0
+            for variant in variants:
+                if variant["code"] in known:
+                    continue
+                banked.append(variant)
+                known.add(variant["code"])
+                added += 1
+            if added:
+                self._save_variants()
+            return added
+
+    def pop_random_variant(self, challenge_id: str, challenge_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Remove and return a random variant matching ``challenge_key``; drops the stale ones."""
+        with self._lock.hold():
+            self._refresh()
+            banked = self._variants.get(challenge_id)
+            if not banked:
+                return None
+            matching = self._matching(challenge_id, challenge_key)
+            variant = matching.pop(random.randrange(len(matching))) if matching else None
+            if len(matching) != len(banked):
+                self._variants[challenge_id] = matching
+                self._save_variants()
+            return variant
+
+    def clear(self, challenge_id: str) -> None:
+        with self._lock.hold():
+            self._refresh()
+            if self._variants.pop(challenge_id, None) is not None:
+                self._save_variants()
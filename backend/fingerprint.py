@@ -0,0 +1,171 @@
+import ast
+import hashlib
+from typing import Dict, List, Optional, Set, Union
+
+_Scope = Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda]
+
+
+def _normalized_text(code: str) -> str:
+    lines = code.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def source_fingerprint(code: str) -> str:
+    """Hash of the exact source.
+
+    Use this where results depend on line numbers, such as execution
+    results whose tracebacks point into the submission.
+    """
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def code_fingerprint(code: str) -> str:
+    """Hash of the submission that ignores formatting and comments.
+
+    Code that parses is fingerprinted by its AST dump; anything else falls
+    back to the source with line endings and trailing whitespace normalized.
+    Line numbers are not part of the hash, so do not key anything that
+    carries a traceback on it (see source_fingerprint).
+    """
+    try:
+        normalized = ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        normalized = _normalized_text(code)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _scope_bindings(scope: _Scope) -> List[str]:
+    """Names local to a function, in order of first appearance.
+
+    Nested functions and classes are not entered (only their own name binds
+    here); comprehension targets are counted as locals of the function.
+    """
+    arguments = scope.args
+    params = [
+        arg.arg
+        for arg in (
+            arguments.posonlyargs
+            + arguments.args
+            + ([arguments.vararg] if arguments.vararg else [])
+            + arguments.kwonlyargs
+            + ([arguments.kwarg] if arguments.kwarg else [])
+        )
+    ]
+    declared: Set[str] = set()
+    stored: List[str] = []
+
+    def _bind(node: ast.AST) -> None:
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+            return
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            stored.append(node.name)
+            return
+        if isinstance(node, ast.Lambda):
+            return
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            stored.append(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            stored.append(node.name)
+        for child in ast.iter_child_nodes(node):
+            _bind(child)
+
+    body = [scope.body] if isinstance(scope, ast.Lambda) else scope.body
+    for node in body:
+        _bind(node)
+
+    bindings: List[str] = []
+    for name in params + stored:
+        if name not in declared and name not in bindings:
+            bindings.append(name)
+    return bindings
+
+
+class _LocalRenamer(ast.NodeTransformer):
+    """Rename function-local variables to positional placeholders.
+
+    Module-level names, attributes and builtins keep their names, so two
+    submissions only collapse when they differ in local naming alone.
+    """
+
+    def __init__(self) -> None:
+        self._scopes: List[Dict[str, str]] = []
+        self._counter = 0
+
+    def _lookup(self, name: str) -> Optional[str]:
+        for mapping in reversed(self._scopes):
+            if name in mapping:
+                return mapping[name]
+        return None
+
+    def _visit_scope(self, node: _Scope) -> ast.AST:
+        if not isinstance(node, ast.Lambda):
+            # The function's own name belongs to the enclosing scope.
+            node.name = self._lookup(node.name) or node.name
+            node.decorator_list = [self.visit(d) for d in node.decorator_list]
+            if node.returns is not None:
+                node.returns = self.visit(node.returns)
+        # Defaults are evaluated in the enclosing scope.
+        node.args.defaults = [self.visit(d) for d in node.args.defaults]
+        node.args.kw_defaults = [
+            self.visit(d) if d is not None else None for d in node.args.kw_defaults
+        ]
+
+        mapping: Dict[str, str] = {}
+        for name in _scope_bindings(node):
+            mapping[name] = f"_v{self._counter}"
+            self._counter += 1
+        self._scopes.append(mapping)
+        try:
+            arguments = node.args
+            for arg in (
+                arguments.posonlyargs
+                + arguments.args
+                + ([arguments.vararg] if arguments.vararg else [])
+                + arguments.kwonlyargs
+                + ([arguments.kwarg] if arguments.kwarg else [])
+            ):
+                arg.arg = mapping.get(arg.arg, arg.arg)
+            if isinstance(node, ast.Lambda):
+                node.body = self.visit(node.body)
+            else:
+                node.body = [self.visit(statement) for statement in node.body]
+        finally:
+            self._scopes.pop()
+        return node
+
+    visit_FunctionDef = _visit_scope
+    visit_AsyncFunctionDef = _visit_scope
+    visit_Lambda = _visit_scope
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
+        node.name = self._lookup(node.name) or node.name
+        return self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        node.id = self._lookup(node.id) or node.id
+        return node
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> ast.AST:
+        node.names = [self._lookup(name) or name for name in node.names]
+        return node
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.AST:
+        if node.name:
+            node.name = self._lookup(node.name) or node.name
+        return self.generic_visit(node)
+
+
+def normalized_code_fingerprint(code: str) -> str:
+    """Like code_fingerprint, but also ignores the names of local variables.
+
+    Submissions that differ only in local names share a fingerprint even
+    though their error messages may not, so this is meant for keys where
+    that is acceptable (hint caching), not for execution results.
+    """
+    try:
+        tree = _LocalRenamer().visit(ast.parse(code))
+        normalized = ast.dump(tree)
+    except (SyntaxError, ValueError):
+        normalized = _normalized_text(code)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
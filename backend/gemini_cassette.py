@@ -0,0 +1,239 @@
+"""Record, replay or synthesize Gemini responses ("cassettes").
+
+``CassetteClient`` stands in for ``genai.Client`` on the
+``models.generate_content`` and ``aio.models.generate_content(_stream)``
+surface:
+
+- record: forward to a real client and store each response on disk under a
+  hash of the request (model, contents, system instruction, temperature,
+  response MIME type and whether it was streamed), together with its latency
+- replay: answer from the stored responses, with the recorded latency or
+  none at all; a request that was never recorded raises CassetteMissError
+- synthetic: answer with whatever ``synthesize(request)`` returns
+
+agents/app.py imports this module from here as well.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+MODES = ("record", "replay", "synthetic")
+
+
+class CassetteMissError(LookupError):
+    """Replay mode got a request that has no recording."""
+
+
+class CassetteUsage:
+    def __init__(self, prompt_token_count: Optional[int], candidates_token_count: Optional[int]) -> None:
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class CassetteResponse:
+    def __init__(self, text: str, usage_metadata: Optional[CassetteUsage] = None) -> None:
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def describe_request(model: str, contents: Any, config: Any, stream: bool = False) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "stream": stream,
+        "contents": contents if isinstance(contents, (str, list)) else str(contents),
+        "system_instruction": str(getattr(config, "system_instruction", "") or ""),
+        "temperature": getattr(config, "temperature", None),
+        "response_mime_type": getattr(config, "response_mime_type", None),
+    }
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage_to_dict(usage: Any) -> Optional[Dict[str, Optional[int]]]:
+    if usage is None:
+        return None
+    return {
+        "prompt_token_count": getattr(usage, "prompt_token_count", None),
+        "candidates_token_count": getattr(usage, "candidates_token_count", None),
+    }
+
+
+def _usage_from_dict(usage: Optional[Dict[str, Optional[int]]]) -> Optional[CassetteUsage]:
+    if not usage:
+        return None
+    return CassetteUsage(usage.get("prompt_token_count"), usage.get("candidates_token_count"))
+
+
+class CassetteClient:
+    def __init__(
+        self,
+        mode: str,
+        directory: str,
+        inner: Any = None,
+        replay_latency: bool = True,
+        synthesize: Optional[Callable[[Dict[str, Any]], str]] = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r} (expected one of {', '.join(MODES)})")
+        if mode == "record" and inner is None:
+            raise ValueError("Record mode needs a client to forward requests to")
+        if mode == "synthetic" and synthesize is None:
+            raise ValueError("Synthetic mode needs a synthesize callable")
+        self.mode = mode
+        self.directory = directory
+        self.inner = inner
+        self.replay_latency = replay_latency
+        self.synthesize = synthesize
+        self._lock = threading.Lock()
+        self.models = _CassetteModels(self)
+        self.aio = _CassetteAio(self)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(request)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise CassetteMissError(f"No recording for request {key} (model {request['model']})") from None
+
+    def _save(self, request: Dict[str, Any], entry: Dict[str, Any]) -> None:
+        key = request_key(request)
+        path = self._path(key)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"request": request, **entry}, file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+
+    def _replay_delay(self, seconds: float) -> float:
+        return seconds if self.replay_latency else 0.0
+
+    def _entry_response(self, entry: Dict[str, Any]) -> CassetteResponse:
+        return CassetteResponse(entry["text"], _usage_from_dict(entry.get("usage")))
+
+    def _synthetic(self, request: Dict[str, Any]) -> CassetteResponse:
+        return CassetteResponse(self.synthesize(request))  # type: ignore[misc]
+
+
+class _CassetteModels:
+    def __init__(self, cassette: CassetteClient) -> None:
+        self._cassette = cassette
+
+    def generate_content(self, *, model: str, contents: Any, config: Any = None) -> Any:
+        cassette = self._cassette
+        request = describe_request(model, contents, config)
+        if cassette.mode == "synthetic":
+            return cassette._synthetic(request)
+        if cassette.mode == "replay":
+            entry = cassette._load(request)
+            time.sleep(cassette._replay_delay(entry.get("latency", 0.0)))
+            return cassette._entry_response(entry)
+
+        started = time.perf_counter()
+        response = cassette.inner.models.generate_content(model=model, contents=contents, config=config)
+        cassette._save(
+            request,
+            {
+                "latency": time.perf_counter() - started,
+                "text": response.text or "",
+                "usage": _usage_to_dict(getattr(response, "usage_metadata", None)),
+            },
+        )
+        return response
+
+
+class _CassetteAsyncModels:
+    def __init__(self, cassette: CassetteClient) -> None:
+        self._cassette = cassette
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None) -> Any:
+        cassette = self._cassette
+        request = describe_request(model, contents, config)
+        if cassette.mode == "synthetic":
+            return cassette._synthetic(request)
+        if cassette.mode == "replay":
+            entry = cassette._load(request)
+            await asyncio.sleep(cassette._replay_delay(entry.get("latency", 0.0)))
+            return cassette._entry_response(entry)
+
+        started = time.perf_counter()
+        response = await cassette.inner.aio.models.generate_content(model=model, contents=contents, config=config)
+        await asyncio.to_thread(
+            cassette._save,
+            request,
+            {
+                "latency": time.perf_counter() - started,
+                "text": response.text or "",
+                "usage": _usage_to_dict(getattr(response, "usage_metadata", None)),
+            },
+        )
+        return response
+
+    async def generate_content_stream(
+        self, *, model: str, contents: Any, config: Any = None
+    ) -> AsyncIterator[Any]:
+        cassette = self._cassette
+        request = describe_request(model, contents, config, stream=True)
+        if cassette.mode == "synthetic":
+            response = cassette._synthetic(request)
+
+            async def _single() -> AsyncIterator[Any]:
+                yield response
+
+            return _single()
+
+        if cassette.mode == "replay":
+            entry = cassette._load(request)
+            chunks = entry.get("chunks") or [[entry.get("latency", 0.0), entry["text"]]]
+            usage = _usage_from_dict(entry.get("usage"))
+
+            async def _replay() -> AsyncIterator[Any]:
+                previous = 0.0
+                for i, (offset, text) in enumerate(chunks):
+                    await asyncio.sleep(cassette._replay_delay(max(0.0, offset - previous)))
+                    previous = offset
+                    yield CassetteResponse(text, usage if i == len(chunks) - 1 else None)
+
+            return _replay()
+
+        stream = await cassette.inner.aio.models.generate_content_stream(
+            model=model, contents=contents, config=config
+        )
+
+        async def _record() -> AsyncIterator[Any]:
+            started = time.perf_counter()
+            chunks: List[List[Any]] = []
+            usage = None
+            async for chunk in stream:
+                chunks.append([time.perf_counter() - started, chunk.text or ""])
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+            await asyncio.to_thread(
+                cassette._save,
+                request,
+                {
+                    "latency": time.perf_counter() - started,
+                    "text": "".join(text for _, text in chunks),
+                    "usage": _usage_to_dict(usage),
+                    "chunks": chunks,
+                },
+            )
+
+        return _record()
+
+
+class _CassetteAio:
+    def __init__(self, cassette: CassetteClient) -> None:
+        self.models = _CassetteAsyncModels(cassette)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import config
+from google.genai import errors
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int) -> None:
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None) -> None:
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly four characters per token, as for English prose.
+    return max(1, len(text) // 4)
+
+
+# Characters per chunk of a streamed fake response
+_STREAM_CHUNK_SIZE = 24
+
+
+def _chunks(response: FakeResponse) -> List[FakeResponse]:
+    """Split a response into stream chunks; the last one carries the usage."""
+    text = response.text
+    pieces = [text[i : i + _STREAM_CHUNK_SIZE] for i in range(0, len(text), _STREAM_CHUNK_SIZE)] or [""]
+    chunks = [FakeResponse(piece) for piece in pieces]
+    chunks[-1].usage_metadata = response.usage_metadata
+    return chunks
+
+
+def _synthetic_text(system_instruction: str) -> str:
+    """Canned JSON in the shape each of our system instructions asks for."""
+    if system_instruction == config.SYSTEM_INSTRUCTION:
+        content: List[Dict[str, str]] = [
+            {
+                "code": f"def main(*args):\n    print('bug {i}')\n",
+                "fixed_code": "def main(*args):\n    print(*args)\n",
+                "explanation": f"バグ{i}: 出力が固定されています。",
+            }
+            for i in range(3)
+        ]
+        return json.dumps({"reasoning": "synthetic", "content": content}, ensure_ascii=False)
+    if system_instruction == config.HINT_SYSTEM_INSTRUCTION:
+        levels = [
+            {"level": level, "title": f"レベル{level}", "content": f"ヒント{level}"}
+            for level in range(1, 5)
+        ]
+        return json.dumps({"levels": levels}, ensure_ascii=False)
+    if system_instruction == config.EXPLANATION_SYSTEM_INSTRUCTION:
+        return json.dumps({"reason": "修正理由", "explain_diff": "- 変更点"}, ensure_ascii=False)
+    if system_instruction == config.RETIRE_SYSTEM_INSTRUCTION:
+        return json.dumps(
+            {
+                "answer_code": "def main(*args):\n    print(*args)\n",
+                "explanation": "解説",
+                "advice": "アドバイス",
+            },
+            ensure_ascii=False,
+        )
+    if system_instruction == config.RETIRE_ADVICE_SYSTEM_INSTRUCTION:
+        return json.dumps({"advice": "アドバイス"}, ensure_ascii=False)
+    return json.dumps({"text": "synthetic"})
+
+
+class FakeGeminiClient:
+    """Offline stand-in for ``genai.Client`` with configurable latency and failures.
+
+    Only the ``models.generate_content`` and ``generate_content_stream``
+    surface used by gemini_utils is implemented, in both its sync and ``aio``
+    flavours. Streams spread the latency evenly over their chunks. Failures are raised as
+    ``errors.ClientError`` with HTTP 429 so callers see the same exception
+    type as a real quota error.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _respond(self, contents: Any, config_obj: Any) -> FakeResponse:
+        self.calls += 1
+        if self._random.random() < self.failure_rate:
+            raise errors.ClientError(
+                429,
+                {"error": {"code": 429, "message": "Synthetic quota error", "status": "RESOURCE_EXHAUSTED"}},
+            )
+        system_instruction = getattr(config_obj, "system_instruction", "") or ""
+        text = _synthetic_text(str(system_instruction))
+        prompt_tokens = _estimate_tokens(str(system_instruction) + str(contents))
+        return FakeResponse(text, FakeUsage(prompt_tokens, _estimate_tokens(text)))
+
+
+class _FakeModels:
+    def __init__(self, client: FakeGeminiClient) -> None:
+        self._client = client
+
+    def generate_content(self, *, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        time.sleep(self._client._delay())
+        return self._client._respond(contents, config)
+
+    def generate_content_stream(
+        self, *, model: str, contents: Any, config: Any = None
+    ) -> Iterator[FakeResponse]:
+        chunks = _chunks(self._client._respond(contents, config))
+        delay = self._client._delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeGeminiClient) -> None:
+        self._client = client
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        await asyncio.sleep(self._client._delay())
+        return self._client._respond(contents, config)
+
+    async def generate_content_stream(
+        self, *, model: str, contents: Any, config: Any = None
+    ) -> AsyncIterator[FakeResponse]:
+        chunks = _chunks(self._client._respond(contents, config))
+        delay = self._client._delay() / len(chunks)
+
+        async def _stream() -> AsyncIterator[FakeResponse]:
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                yield chunk
+
+        return _stream()
+
+
+class _FakeAio:
+    def __init__(self, client: FakeGeminiClient) -> None:
+        self.models = _FakeAsyncModels(client)
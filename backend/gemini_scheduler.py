@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from google.genai import errors
+
+
+class Priority(IntEnum):
+    """Scheduling classes; lower values are served first."""
+
+    INTERACTIVE = 0  # hints and explanations a student is waiting on
+    GENERATION = 1  # buggy code generation when starting a challenge
+    BACKGROUND = 2  # variant bank refills and pre-warming
+
+
+# Share of the queue each class may fill before it is turned away, so a
+# saturated queue still admits interactive requests.
+_QUEUE_SHARE = {
+    Priority.INTERACTIVE: 1.0,
+    Priority.GENERATION: 0.75,
+    Priority.BACKGROUND: 0.5,
+}
+
+
+class GeminiUnavailableError(Exception):
+    """Gemini cannot take the request now; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SchedulerSaturatedError(GeminiUnavailableError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Quota errors (429) and server-side failures (5xx) are worth retrying."""
+    if not isinstance(exc, errors.APIError):
+        return False
+    code = getattr(exc, "code", None)
+    return code == 429 or (isinstance(code, int) and code >= 500)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class GeminiScheduler:
+    """Central admission control for Gemini calls.
+
+    Every attempt needs a token from a bucket refilled at the quota rate and
+    one of ``max_concurrency`` slots. Waiting callers are served by priority
+    class, then in arrival order. When the queue is full, callers are
+    rejected immediately with SchedulerSaturatedError instead of piling up.
+    Quota and server errors are retried with jittered exponential backoff;
+    once retries are exhausted they surface as GeminiUnavailableError.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_concurrency: int,
+        max_queue: int,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+    ) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._bucket = TokenBucket(self.rate, burst)
+        self._queue: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._waiting: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._active = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.completed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _retry_after(self) -> float:
+        return max(1.0, math.ceil((sum(self._waiting.values()) + 1) / self.rate))
+
+    def _pump(self) -> None:
+        while self._queue and self._active < self.max_concurrency:
+            waiter = self._queue[0][2]
+            if waiter.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._bucket.take()
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            heapq.heappop(self._queue)
+            self._active += 1
+            waiter.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._pump()
+
+    async def _acquire(self, priority: Priority) -> None:
+        waiting = sum(self._waiting.values())
+        if waiting >= self.max_queue * _QUEUE_SHARE[priority]:
+            self.rejected += 1
+            raise SchedulerSaturatedError("Gemini request queue is full", self._retry_after())
+
+        if not self._queue and self._active < self.max_concurrency and self._bucket.take() == 0:
+            self._active += 1
+            return
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._seq), waiter))
+        self._waiting[priority] += 1
+        try:
+            self._pump()
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the caller went away.
+                self._release()
+            raise
+        finally:
+            self._waiting[priority] -= 1
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._pump()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Hold one admitted slot for the duration of the block (no retries)."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        priority: Priority,
+        on_retry: Optional[Callable[[BaseException], None]] = None,
+    ) -> Any:
+        """Run ``fn`` under the rate limit, retrying quota and server errors."""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(priority):
+                    result = await fn()
+            except Exception as exc:
+                if not is_retryable(exc):
+                    raise
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    raise GeminiUnavailableError(
+                        f"Gemini is unavailable after {attempt + 1} attempts: {exc}",
+                        self._retry_after(),
+                    ) from exc
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.retried += 1
+                if on_retry is not None:
+                    on_retry(exc)
+                await asyncio.sleep(delay)
+                continue
+            self.completed += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": {priority.name.lower(): count for priority, count in self._waiting.items()},
+            "tokens": round(self._bucket.tokens, 2),
+            "completed": self.completed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
@@ -1,14 +1,61 @@
+import asyncio
 import json
 import random
 import re
 import textwrap
-from typing import Any, Callable, Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import config
 from google import genai
 from google.genai import types
-
-client = genai.Client(api_key=config.GEMINI_API_KEY)
+from gemini_scheduler import GeminiScheduler, GeminiUnavailableError, Priority
+from hint_cache import get_cached_hints, hint_cache_key, prompt_version, store_hints
+from llm_metrics import (
+    llm_cache_hits,
+    llm_latency,
+    llm_parse_failures,
+    llm_prompt_elided_tokens,
+    llm_requests,
+    llm_retries,
+    record_usage,
+)
+from prompt_budget import PromptSection, build_prompt, summarize_test_results
+from singleflight import SingleFlight
+
+if config.GEMINI_TRANSPORT == "synthetic":
+    from gemini_fake import FakeGeminiClient
+
+    client: Any = FakeGeminiClient(
+        latency=config.GEMINI_FAKE_LATENCY_SECONDS,
+        jitter=config.GEMINI_FAKE_LATENCY_JITTER_SECONDS,
+        failure_rate=config.GEMINI_FAKE_FAILURE_RATE,
+    )
+elif config.GEMINI_TRANSPORT in ("record", "replay"):
+    from gemini_cassette import CassetteClient
+
+    client = CassetteClient(
+        config.GEMINI_TRANSPORT,
+        config.GEMINI_CASSETTE_DIR,
+        inner=genai.Client(api_key=config.GEMINI_API_KEY) if config.GEMINI_TRANSPORT == "record" else None,
+        replay_latency=config.GEMINI_REPLAY_LATENCY != "zero",
+    )
+else:
+    client = genai.Client(api_key=config.GEMINI_API_KEY)
+
+# Rate limit, priorities, retries and backpressure for every upstream call.
+scheduler = GeminiScheduler(
+    rate_per_minute=config.GEMINI_RATE_LIMIT_PER_MINUTE,
+    burst=config.GEMINI_RATE_LIMIT_BURST,
+    max_concurrency=config.GEMINI_MAX_IN_FLIGHT,
+    max_queue=config.GEMINI_MAX_QUEUE,
+    max_retries=config.GEMINI_MAX_RETRIES,
+    backoff_base=config.GEMINI_RETRY_BASE_SECONDS,
+    backoff_max=config.GEMINI_RETRY_MAX_SECONDS,
+)
+# Identical concurrent requests (e.g. a whole class pressing "generate" at
+# once) share one upstream call.
+_coalesced = SingleFlight()
 
 INLINE_CODE_PATTERN = re.compile(r"(^|[^`])`([^`\n]+)`(?!`)")
 TRIPLE_BACKTICK_PATTERN = re.compile(r"```([a-zA-Z0-9_-]+)?\s*\n?([\s\S]*?)```", re.MULTILINE)
@@ -97,31 +144,228 @@ def _load_hint_payload(raw_text: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def generate_code_logic(
-    prompt_str: str,
-    test_cases: List[Dict[str, Any]],
-    fn_test_code_against_all_cases: Callable[[str, List[Dict[str, Any]]], bool],
-) -> Dict[str, str]:
-    response = client.models.generate_content(
+async def _call_generate_content(
+    prompt: str,
+    *,
+    model: str,
+    system_instruction: str,
+    temperature: float,
+    priority: Priority,
+    endpoint: str,
+) -> Any:
+    async def _attempt() -> Any:
+        started = time.perf_counter()
+        try:
+            return await client.aio.models.generate_content(
+                model=model,
+                contents=[prompt],
+                config=types.GenerateContentConfig(
+                    temperature=temperature,
+                    system_instruction=system_instruction,
+                    response_mime_type="application/json",
+                ),
+            )
+        finally:
+            llm_latency.observe(time.perf_counter() - started, endpoint=endpoint, model=model)
+
+    try:
+        response = await scheduler.run(
+            _attempt,
+            priority,
+            on_retry=lambda _exc: llm_retries.inc(endpoint=endpoint, model=model),
+        )
+    except GeminiUnavailableError:
+        llm_requests.inc(endpoint=endpoint, model=model, outcome="unavailable")
+        raise
+    except Exception:
+        llm_requests.inc(endpoint=endpoint, model=model, outcome="error")
+        raise
+    llm_requests.inc(endpoint=endpoint, model=model, outcome="ok")
+    record_usage(response, endpoint, model)
+    return response
+
+
+async def _generate_content(
+    prompt: str,
+    *,
+    model: str,
+    system_instruction: str,
+    temperature: float,
+    endpoint: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> Any:
+    """Call Gemini, sharing the call with identical concurrent requests.
+
+    A shared call is scheduled with the priority of the caller that started
+    it, and its latency and tokens are recorded once, under that caller's
+    endpoint.
+    """
+    call = lambda: _call_generate_content(  # noqa: E731
+        prompt,
+        model=model,
+        system_instruction=system_instruction,
+        temperature=temperature,
+        priority=priority,
+        endpoint=endpoint,
+    )
+    if not config.GEMINI_COALESCE_REQUESTS:
+        return await call()
+    key = (model, system_instruction, prompt, temperature)
+    if _coalesced.in_flight(key):
+        llm_cache_hits.inc(endpoint=endpoint, model=model, cache="coalesced")
+    return await _coalesced.do(key, call)
+
+
+def gemini_stats() -> Dict[str, Any]:
+    return {"scheduler": scheduler.stats(), "coalescing": _coalesced.stats()}
+
+
+async def _generate_content_stream(
+    prompt: str,
+    *,
+    model: str,
+    system_instruction: str,
+    temperature: float,
+    endpoint: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> AsyncIterator[str]:
+    """Text of a streamed response, chunk by chunk.
+
+    Streams are rate limited like any call but not retried, since part of
+    the response may already have been passed on.
+    """
+    async with scheduler.slot(priority):
+        started = time.perf_counter()
+        last_chunk = None
+        outcome = "error"
+        try:
+            stream = await client.aio.models.generate_content_stream(
+                model=model,
+                contents=[prompt],
+                config=types.GenerateContentConfig(
+                    temperature=temperature,
+                    system_instruction=system_instruction,
+                    response_mime_type="application/json",
+                ),
+            )
+            async for chunk in stream:
+                last_chunk = chunk
+                if chunk.text:
+                    yield chunk.text
+            outcome = "ok"
+        finally:
+            llm_latency.observe(time.perf_counter() - started, endpoint=endpoint, model=model)
+            llm_requests.inc(endpoint=endpoint, model=model, outcome=outcome)
+            # The final chunk carries the usage of the whole response.
+            record_usage(last_chunk, endpoint, model)
+
+
+def _budgeted_prompt(
+    template: str, sections: List[PromptSection], *, endpoint: str, model: str
+) -> str:
+    """Fill a prompt template within PROMPT_TOKEN_BUDGET, recording what was elided."""
+    prompt = build_prompt(template, sections, config.PROMPT_TOKEN_BUDGET)
+    if prompt.elided_tokens:
+        llm_prompt_elided_tokens.inc(prompt.total_elided, endpoint=endpoint, model=model)
+        print(
+            f"Prompt for {endpoint} trimmed to ~{prompt.estimated_tokens} tokens "
+            f"(elided: {prompt.elided_tokens})"
+        )
+    return prompt.text
+
+
+def _test_results_section(test_results: List[Dict[str, Any]]) -> PromptSection:
+    return PromptSection(
+        "test_results_text",
+        summarize_test_results(test_results, config.PROMPT_MAX_TRACEBACK_FRAMES),
+        config.PROMPT_MAX_TEST_RESULTS_TOKENS,
+    )
+
+
+_CODE_GENERATION_PROMPT_TEMPLATE = "Problem description:\n{challenge}\n"
+
+
+def code_generation_prompt(challenge: str, endpoint: str = "generate_code") -> str:
+    return _budgeted_prompt(
+        _CODE_GENERATION_PROMPT_TEMPLATE,
+        [PromptSection("challenge", challenge, config.PROMPT_MAX_INSTRUCTIONS_TOKENS)],
+        endpoint=endpoint,
+        model=config.GEMINI_MODEL_NAME,
+    )
+
+
+async def _request_code_candidates(
+    prompt_str: str, priority: Priority, endpoint: str
+) -> Dict[str, Any]:
+    response = await _generate_content(
+        prompt_str,
         model=config.GEMINI_MODEL_NAME,
-        contents=[prompt_str],
-        config=types.GenerateContentConfig(
-            temperature=config.GEMINI_TEMPERATURE,
-            system_instruction=config.SYSTEM_INSTRUCTION,
-            response_mime_type="application/json",
-        ),
+        system_instruction=config.SYSTEM_INSTRUCTION,
+        temperature=config.GEMINI_TEMPERATURE,
+        endpoint=endpoint,
+        priority=priority,
     )
     print(
         f"Gemini API response for code generation: {response.text[:500]}..."  # type: ignore
     )  # Log snippet
 
     try:
-        response_json: Dict[str, Any] = json.loads(response.text)  # type: ignore
+        return json.loads(response.text)  # type: ignore
     except json.JSONDecodeError as e:
+        llm_parse_failures.inc(endpoint=endpoint, model=config.GEMINI_MODEL_NAME)
         print(f"JSONDecodeError in generate_code_logic: {e}")
         print(f"Response text was: {response.text}")
         raise  # Re-raise to be caught by handler
 
+
+async def generate_variants(
+    prompt_str: str,
+    test_cases: List[Dict[str, Any]],
+    validate_candidate: Callable[[str, List[Dict[str, Any]]], Awaitable[bool]],
+    priority: Priority = Priority.BACKGROUND,
+) -> List[Dict[str, Any]]:
+    """Every candidate of one Gemini call that fails at least one test case.
+
+    Unlike generate_code_logic, all candidates are validated to completion
+    and returned with their ``fixed_code`` and ``explanation``.
+    """
+    response_json = await _request_code_candidates(prompt_str, priority, "variant_bank")
+    items = [
+        item
+        for item in response_json.get("content") or []
+        if isinstance(item, dict) and item.get("code")
+    ]
+
+    async def _qualifies(item: Dict[str, Any]) -> bool:
+        try:
+            all_tests_pass = await asyncio.wait_for(
+                validate_candidate(item["code"], test_cases),
+                config.CANDIDATE_VALIDATION_TIMEOUT_SECONDS,
+            )
+        except TimeoutError:
+            return False
+        return not all_tests_pass
+
+    qualifies = await asyncio.gather(*(_qualifies(item) for item in items))
+    return [
+        {
+            "code": item["code"],
+            "fixed_code": item.get("fixed_code", ""),
+            "explanation": item.get("explanation", ""),
+        }
+        for item, ok in zip(items, qualifies)
+        if ok
+    ]
+
+
+async def generate_code_logic(
+    prompt_str: str,
+    test_cases: List[Dict[str, Any]],
+    validate_candidate: Callable[[str, List[Dict[str, Any]]], Awaitable[bool]],
+) -> Dict[str, Any]:
+    """Pick one buggy candidate; its ``fixed_code`` is returned alongside for storage only."""
+    response_json = await _request_code_candidates(prompt_str, Priority.GENERATION, "generate_code")
+
     if not test_cases:
         if not response_json.get(
             "content"
@@ -130,25 +374,53 @@ def generate_code_logic(
         selected_idx: int = random.randint(0, len(response_json["content"]) - 1)
         generated_code: str = response_json["content"][selected_idx]["code"]
         explanation: str = response_json["content"][selected_idx]["explanation"]
-        return {"code": generated_code, "explanation": explanation}
+        fixed_code: Optional[str] = response_json["content"][selected_idx].get("fixed_code")
+        return {"code": generated_code, "explanation": explanation, "fixed_code": fixed_code}
 
     if not response_json.get("content"):
         return {"error": "生成されたコードが空です。プロンプトを確認してください。"}
 
+    async def _validate(item: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        all_tests_pass = await asyncio.wait_for(
+            validate_candidate(item["code"], test_cases),
+            config.CANDIDATE_VALIDATION_TIMEOUT_SECONDS,
+        )
+        return item, all_tests_pass
+
+    tasks: List["asyncio.Task[Tuple[Dict[str, Any], bool]]"] = []
     for idx in range(len(response_json["content"])):
         item = response_json["content"][idx]
-        code = item.get("code")
-        explanation = item.get("explanation")
 
-        if not code:  # Skip if code is missing for an item
+        if not item.get("code"):  # Skip if code is missing for an item
             print(f"Warning: Missing code in generated content item {idx}")
             continue
 
-        all_tests_pass = fn_test_code_against_all_cases(code, test_cases)
+        tasks.append(asyncio.ensure_future(_validate(item)))
 
-        if not all_tests_pass:
-            print(f"Selected code (failed at least one test case):\n```\n{code}\n```")
-            return {"code": code, "explanation": explanation}
+    # Validate every candidate concurrently and hand out the first one found
+    # to fail a test; the remaining validations are cancelled.
+    timed_out = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                item, all_tests_pass = await next_done
+            except TimeoutError:
+                timed_out += 1
+                continue
+
+            if not all_tests_pass:
+                code = item["code"]
+                print(f"Selected code (failed at least one test case):\n```\n{code}\n```")
+                return {"code": code, "explanation": item.get("explanation"), "fixed_code": item.get("fixed_code")}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if timed_out:
+        print(f"{timed_out} generated code(s) timed out during validation.")
+        return {
+            "error": "生成コードの検証がタイムアウトしました。もう一度お試しください。"
+        }
 
     print(
         "All generated codes passed all test cases. This might indicate an issue or easy problem."
@@ -160,16 +432,76 @@ def generate_code_logic(
     }
 
 
-def _build_test_results_summary(test_results: List[Dict[str, Any]]) -> str:
-    summary = ""
-    for i, result in enumerate(test_results):
-        status = "成功" if result.get("status") == "success" else "失敗"
-        summary += f"テストケース {i + 1}: {status}\n"
-        message = result.get("message", "")
-        if not isinstance(message, str):
-            message = str(message)
-        summary += f"メッセージ: {message}\n\n"
-    return summary
+def _parse_hint_level(item: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(item, dict):
+        return None
+    level = item.get("level")
+    content = item.get("content")
+    title = item.get("title")
+    if level is None or content is None:
+        return None
+    return {
+        "level": int(level),
+        "title": str(title) if title is not None else "",
+        "content": _normalize_hint_content(str(content)),
+    }
+
+
+class _HintLevelStreamParser:
+    """Pull complete level objects out of a hint payload as it streams in.
+
+    Scans for the ``"levels"`` (or ``"hints"``) array and hands back every
+    top-level object of it once its closing brace has arrived. Each chunk is
+    scanned once; the full text is kept for the non-streaming fallback.
+    """
+
+    _ARRAY_START = re.compile(r'"(?:levels|hints)"\s*:\s*\[')
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._pos: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = 0
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        if self._pos is None:
+            match = self._ARRAY_START.search(self.text)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        items: List[Dict[str, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self._closed:
+            char = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads(text[self._item_start : self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == "]" and self._depth == 0:
+                self._closed = True
+            self._pos += 1
+        return items
 
 
 def _parse_hint_levels(raw_text: str) -> List[Dict[str, Any]]:
@@ -198,20 +530,9 @@ def _parse_hint_levels(raw_text: str) -> List[Dict[str, Any]]:
 
     parsed_levels: List[Dict[str, Any]] = []
     for item in levels:
-        if not isinstance(item, dict):
-            continue
-        level = item.get("level")
-        content = item.get("content")
-        title = item.get("title")
-        if level is None or content is None:
-            continue
-        parsed_levels.append(
-            {
-                "level": int(level),
-                "title": str(title) if title is not None else "",
-                "content": _normalize_hint_content(str(content)),
-            }
-        )
+        parsed = _parse_hint_level(item)
+        if parsed is not None:
+            parsed_levels.append(parsed)
 
     parsed_levels.sort(key=lambda x: x["level"])
     return parsed_levels if parsed_levels else [
@@ -223,87 +544,153 @@ def _parse_hint_levels(raw_text: str) -> List[Dict[str, Any]]:
     ]
 
 
-def generate_hint_logic(
-    code: str, instructions: str, examples: str, test_results: List[Dict[str, Any]]
-) -> List[Dict[str, Any]]:
-    test_results_text = _build_test_results_summary(test_results)
-
-    prompt_template = textwrap.dedent(
-        """
-        課題:
-        {instructions}
-
-        例:
-        {examples}
-
-        学生のコード:
-        {code}
-
-        テスト結果:
-        {test_results_text}
-
-        レベル1からレベル4まで段階的に情報量が増えるヒントを作成してください。各レベルの目的は以下です。
-        - レベル1: 解決への方向性や観察すべきポイントを短く提示する。
-        - レベル2: 具体的なキーワード、関連する定理やアプローチ名を示す。
-        - レベル3: 解法の大まかな手順や必要な式・疑似コードの骨子を説明する。
-        - レベル4: ほぼ答えに近い形で具体的な対処法や境界条件を提示する。
-
-        以下のJSON形式のみで出力してください（コードブロックは不要です）。
-        {{
-          "levels": [
-            {{"level": 1, "title": "方向性", "content": "..."}},
-            {{"level": 2, "title": "キーワード", "content": "..."}},
-            {{"level": 3, "title": "骨子", "content": "..."}},
-            {{"level": 4, "title": "最終ヒント", "content": "..."}}
-          ]
-        }}
-
-        タイトルは任意で調整しても構いませんが、各レベルの粒度が段階的に深まるようにしてください。
-        ヒント本文内でコードや識別子を示す場合は、インラインなら ``example``、複数行のコードは ```python\n...\n``` のようにバッククォートでマークアップしてください。
-        ヒント本文内で改行が必要な場合は、実際の改行ではなく文字列として "\\n" を挿入してください。
-        """
+_HINT_PROMPT_TEMPLATE = textwrap.dedent(
+    """
+    課題:
+    {instructions}
+
+    例:
+    {examples}
+
+    学生のコード:
+    {code}
+
+    テスト結果:
+    {test_results_text}
+
+    レベル1からレベル4まで段階的に情報量が増えるヒントを作成してください。各レベルの目的は以下です。
+    - レベル1: 解決への方向性や観察すべきポイントを短く提示する。
+    - レベル2: 具体的なキーワード、関連する定理やアプローチ名を示す。
+    - レベル3: 解法の大まかな手順や必要な式・疑似コードの骨子を説明する。
+    - レベル4: ほぼ答えに近い形で具体的な対処法や境界条件を提示する。
+
+    以下のJSON形式のみで出力してください（コードブロックは不要です）。
+    {{
+      "levels": [
+        {{"level": 1, "title": "方向性", "content": "..."}},
+        {{"level": 2, "title": "キーワード", "content": "..."}},
+        {{"level": 3, "title": "骨子", "content": "..."}},
+        {{"level": 4, "title": "最終ヒント", "content": "..."}}
+      ]
+    }}
+
+    タイトルは任意で調整しても構いませんが、各レベルの粒度が段階的に深まるようにしてください。
+    ヒント本文内でコードや識別子を示す場合は、インラインなら ``example``、複数行のコードは ```python\n...\n``` のようにバッククォートでマークアップしてください。
+    ヒント本文内で改行が必要な場合は、実際の改行ではなく文字列として "\\n" を挿入してください。
+    """
+)
+
+_HINT_MODEL_NAME = "gemini-2.0-flash"  # Consider making model name a config variable
+_HINT_TEMPERATURE = 0.0  # Consider making temperature a config variable
+# Changing any of these invalidates the cached hints.
+_HINT_PROMPT_VERSION = prompt_version(
+    _HINT_MODEL_NAME,
+    config.HINT_SYSTEM_INSTRUCTION,
+    _HINT_PROMPT_TEMPLATE,
+    _HINT_TEMPERATURE,
+    config.PROMPT_TOKEN_BUDGET,
+    config.PROMPT_MAX_INSTRUCTIONS_TOKENS,
+    config.PROMPT_MAX_EXAMPLES_TOKENS,
+    config.PROMPT_MAX_CODE_TOKENS,
+    config.PROMPT_MAX_TEST_RESULTS_TOKENS,
+    config.PROMPT_MAX_TRACEBACK_FRAMES,
+)
+
+
+def _build_hint_prompt(
+    code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+    endpoint: str,
+) -> str:
+    return _budgeted_prompt(
+        _HINT_PROMPT_TEMPLATE,
+        [
+            PromptSection("instructions", instructions, config.PROMPT_MAX_INSTRUCTIONS_TOKENS),
+            PromptSection("examples", examples, config.PROMPT_MAX_EXAMPLES_TOKENS),
+            PromptSection("code", code, config.PROMPT_MAX_CODE_TOKENS),
+            _test_results_section(test_results),
+        ],
+        endpoint=endpoint,
+        model=_HINT_MODEL_NAME,
     )
 
-    prompt = prompt_template.format(
-        instructions=instructions,
-        examples=examples,
-        code=code,
-        test_results_text=test_results_text,
-    )
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",  # Consider making model name a config variable
-        contents=[prompt],
-        config=types.GenerateContentConfig(
-            temperature=0.0,  # Consider making temperature a config variable
-            system_instruction=config.HINT_SYSTEM_INSTRUCTION,
-            response_mime_type="application/json",
-        ),
+async def generate_hint_logic(
+    code: str, instructions: str, examples: str, test_results: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    cache_key = hint_cache_key(_HINT_PROMPT_VERSION, code, instructions, examples, test_results)
+    if cache_key is not None:
+        cached = get_cached_hints(cache_key)
+        if cached is not None:
+            llm_cache_hits.inc(endpoint="generate_hint", model=_HINT_MODEL_NAME, cache="hint")
+            return cached
+
+    prompt = _build_hint_prompt(code, instructions, examples, test_results, "generate_hint")
+    response = await _generate_content(
+        prompt,
+        model=_HINT_MODEL_NAME,
+        system_instruction=config.HINT_SYSTEM_INSTRUCTION,
+        temperature=_HINT_TEMPERATURE,
+        endpoint="generate_hint",
     )
 
-    return _parse_hint_levels(response.text)  # type: ignore
-
+    if _load_hint_payload(response.text) is None:  # type: ignore[arg-type]
+        llm_parse_failures.inc(endpoint="generate_hint", model=_HINT_MODEL_NAME)
+    hints = _parse_hint_levels(response.text)  # type: ignore
+    if cache_key is not None:
+        store_hints(cache_key, hints)
+    return hints
 
-def _summarize_test_results(test_results: List[Dict[str, Any]]) -> str:
-    text = ""
-    for i, result in enumerate(test_results):
-        status = "成功" if result.get("status") == "success" else "失敗"
-        message = result.get("message", "")
-        if not isinstance(message, str):
-            message = str(message)
-        text += f"テストケース {i + 1}: {status}\nメッセージ: {message}\n\n"
-    return text
 
-
-def generate_explanation_logic(
-    before_code: str,
-    after_code: str,
-    instructions: str,
-    examples: str,
-    test_results: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    test_results_text = _summarize_test_results(test_results)
-    prompt = f"""
+async def stream_hint_logic(
+    code: str, instructions: str, examples: str, test_results: List[Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield hint levels one by one as soon as each is complete.
+
+    Levels are parsed from the streamed response while it arrives. Whatever
+    could not be parsed incrementally (the model broke format or answered in
+    plain text) is recovered from the full text by _parse_hint_levels once
+    the stream ends.
+    """
+    cache_key = hint_cache_key(_HINT_PROMPT_VERSION, code, instructions, examples, test_results)
+    if cache_key is not None:
+        cached = get_cached_hints(cache_key)
+        if cached is not None:
+            llm_cache_hits.inc(endpoint="generate_hint_stream", model=_HINT_MODEL_NAME, cache="hint")
+            for level in cached:
+                yield level
+            return
+
+    prompt = _build_hint_prompt(code, instructions, examples, test_results, "generate_hint_stream")
+    parser = _HintLevelStreamParser()
+    emitted: Dict[int, Dict[str, Any]] = {}
+    async for text in _generate_content_stream(
+        prompt,
+        model=_HINT_MODEL_NAME,
+        system_instruction=config.HINT_SYSTEM_INSTRUCTION,
+        temperature=_HINT_TEMPERATURE,
+        endpoint="generate_hint_stream",
+    ):
+        for item in parser.feed(text):
+            level = _parse_hint_level(item)
+            if level is not None and level["level"] not in emitted:
+                emitted[level["level"]] = level
+                yield level
+
+    if not emitted:
+        llm_parse_failures.inc(endpoint="generate_hint_stream", model=_HINT_MODEL_NAME)
+    for level in _parse_hint_levels(parser.text):
+        if level["level"] not in emitted:
+            emitted[level["level"]] = level
+            yield level
+
+    if cache_key is not None:
+        store_hints(cache_key, sorted(emitted.values(), key=lambda x: x["level"]))
+
+
+_EXPLANATION_PROMPT_TEMPLATE = """
 課題:
 {instructions}
 
@@ -319,36 +706,30 @@ After (修正後のコード):
 テスト結果サマリ:
 {test_results_text}
 """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[prompt],
-        config=types.GenerateContentConfig(
-            temperature=0.2,
-            system_instruction=config.EXPLANATION_SYSTEM_INSTRUCTION,
-            response_mime_type="application/json",
-        ),
-    )
-    # Ensure valid JSON
-    try:
-        return json.loads(response.text)  # type: ignore[arg-type]
-    except Exception as e:
-        # Fallback: wrap raw text
-        return {
-            "reason": "解説の生成に失敗しました。",
-            "explain_diff": "解説の生成に失敗しました。",
-            "raw": getattr(response, "text", str(e)),
-        }
 
+_RETIRE_PROMPT_TEMPLATE = """
+課題の説明:
+{instructions}
+
+例:
+{examples}
 
-def generate_retire_explanation_logic(
-    before_code: str,
-    after_code: str,
-    instructions: str,
-    examples: str,
-    test_results: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    test_results_text = _summarize_test_results(test_results)
-    prompt = f"""
+AI生成コード（学習者が修正の出発点としたコード）:
+```python
+{before_code}
+```
+
+学習者の最新コード（学習者が修正を試みた後のコード）:
+```python
+{after_code}
+```
+
+テスト結果:
+{test_results_text}
+"""
+
+
+_RETIRE_ADVICE_PROMPT_TEMPLATE = """
 課題の説明:
 {instructions}
 
@@ -360,6 +741,14 @@ AI生成コード（学習者が修正の出発点としたコード）:
 {before_code}
 ```
 
+正解コード:
+```python
+{answer_code}
+```
+
+解説:
+{explanation}
+
 学習者の最新コード（学習者が修正を試みた後のコード）:
 ```python
 {after_code}
@@ -368,20 +757,119 @@ AI生成コード（学習者が修正の出発点としたコード）:
 テスト結果:
 {test_results_text}
 """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[prompt],
-        config=types.GenerateContentConfig(
-            temperature=0.15,
-            system_instruction=config.RETIRE_SYSTEM_INSTRUCTION,
-            response_mime_type="application/json",
-        ),
+
+
+def _explanation_sections(
+    before_code: str,
+    after_code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+) -> List[PromptSection]:
+    return [
+        PromptSection("instructions", instructions, config.PROMPT_MAX_INSTRUCTIONS_TOKENS),
+        PromptSection("examples", examples, config.PROMPT_MAX_EXAMPLES_TOKENS),
+        PromptSection("before_code", before_code, config.PROMPT_MAX_CODE_TOKENS),
+        PromptSection("after_code", after_code, config.PROMPT_MAX_CODE_TOKENS),
+        _test_results_section(test_results),
+    ]
+
+
+async def generate_explanation_logic(
+    before_code: str,
+    after_code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    prompt = _budgeted_prompt(
+        _EXPLANATION_PROMPT_TEMPLATE,
+        _explanation_sections(before_code, after_code, instructions, examples, test_results),
+        endpoint="generate_explanation",
+        model=config.GEMINI_MODEL_NAME,
+    )
+    response = await _generate_content(
+        prompt,
+        model=config.GEMINI_MODEL_NAME,
+        system_instruction=config.EXPLANATION_SYSTEM_INSTRUCTION,
+        temperature=0.2,
+        endpoint="generate_explanation",
     )
+    # Ensure valid JSON
     try:
         return json.loads(response.text)  # type: ignore[arg-type]
     except Exception as e:
+        llm_parse_failures.inc(endpoint="generate_explanation", model=config.GEMINI_MODEL_NAME)
+        # Fallback: wrap raw text
+        return {
+            "reason": "解説の生成に失敗しました。",
+            "explain_diff": "解説の生成に失敗しました。",
+            "raw": getattr(response, "text", str(e)),
+        }
+
+
+async def generate_retire_explanation_logic(
+    before_code: str,
+    after_code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    prompt = _budgeted_prompt(
+        _RETIRE_PROMPT_TEMPLATE,
+        _explanation_sections(before_code, after_code, instructions, examples, test_results),
+        endpoint="generate_retire_explanation",
+        model=config.GEMINI_MODEL_NAME,
+    )
+    response = await _generate_content(
+        prompt,
+        model=config.GEMINI_MODEL_NAME,
+        system_instruction=config.RETIRE_SYSTEM_INSTRUCTION,
+        temperature=0.15,
+        endpoint="generate_retire_explanation",
+    )
+    try:
+        return json.loads(response.text)  # type: ignore[arg-type]
+    except Exception as e:
+        llm_parse_failures.inc(endpoint="generate_retire_explanation", model=config.GEMINI_MODEL_NAME)
         return {
             "reason": "リタイア解説の生成に失敗しました。",
             "explain_diff": "リタイア解説の生成に失敗しました。",
             "raw": getattr(response, "text", str(e)),
         }
+
+
+async def generate_retire_advice_logic(
+    before_code: str,
+    after_code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+    answer_code: str,
+    explanation: str,
+) -> Dict[str, Any]:
+    """Retire explanation built from a stored fix; only the advice comes from Gemini."""
+    prompt = _budgeted_prompt(
+        _RETIRE_ADVICE_PROMPT_TEMPLATE,
+        _explanation_sections(before_code, after_code, instructions, examples, test_results)
+        + [
+            PromptSection("answer_code", answer_code, config.PROMPT_MAX_CODE_TOKENS),
+            PromptSection("explanation", explanation, config.PROMPT_MAX_INSTRUCTIONS_TOKENS),
+        ],
+        endpoint="generate_retire_advice",
+        model=config.GEMINI_MODEL_NAME,
+    )
+    response = await _generate_content(
+        prompt,
+        model=config.GEMINI_MODEL_NAME,
+        system_instruction=config.RETIRE_ADVICE_SYSTEM_INSTRUCTION,
+        temperature=0.15,
+        endpoint="generate_retire_advice",
+    )
+    result: Dict[str, Any] = {"answer_code": answer_code, "explanation": explanation}
+    try:
+        result["advice"] = json.loads(response.text)["advice"]  # type: ignore[arg-type]
+    except Exception:
+        llm_parse_failures.inc(endpoint="generate_retire_advice", model=config.GEMINI_MODEL_NAME)
+        result["advice"] = ""
+    return result
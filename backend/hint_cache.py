@@ -0,0 +1,55 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import config
+from cache import LRUCache
+from fingerprint import normalized_code_fingerprint
+
+_hints = LRUCache(config.HINT_CACHE_SIZE)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def hint_cache_key(
+    prompt_version: str,
+    code: str,
+    instructions: str,
+    examples: str,
+    test_results: List[Dict[str, Any]],
+) -> Optional[str]:
+    """Key for hints that only depends on what determines them.
+
+    ``prompt_version`` identifies the model, system instruction, prompt
+    template and temperature, so changing any of them misses the old
+    entries. The challenge is identified by its instructions and examples,
+    the code by its local-name-insensitive fingerprint and the test results
+    by their status pattern.
+    """
+    if not config.HINT_CACHE_ENABLED:
+        return None
+    challenge = _digest(instructions, json.dumps(examples, sort_keys=True, ensure_ascii=False, default=str))
+    pattern = ",".join(str(result.get("status", "error")) for result in test_results)
+    return f"{prompt_version}:{challenge}:{normalized_code_fingerprint(code)}:{pattern}"
+
+
+def prompt_version(*parts: Any) -> str:
+    return _digest(*(str(part) for part in parts))[:16]
+
+
+def get_cached_hints(key: str) -> Optional[List[Dict[str, Any]]]:
+    hints = _hints.get(key)
+    return [dict(level) for level in hints] if hints is not None else None
+
+
+def store_hints(key: str, hints: List[Dict[str, Any]]) -> None:
+    _hints.set(key, [dict(level) for level in hints])
+
+
+def hint_cache_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = _hints.stats()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hitRate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
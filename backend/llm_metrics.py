@@ -0,0 +1,60 @@
+from typing import Any
+
+from metrics import Counter, Histogram
+
+_LABELS = ("endpoint", "model")
+
+llm_requests = Counter(
+    "gemini_requests_total",
+    "Gemini calls by outcome (ok, error, unavailable)",
+    labelnames=_LABELS + ("outcome",),
+)
+llm_latency = Histogram(
+    "gemini_request_latency_seconds",
+    "Upstream latency of one Gemini attempt",
+    (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0),
+    labelnames=_LABELS,
+)
+llm_prompt_tokens = Counter(
+    "gemini_prompt_tokens_total",
+    "Prompt tokens sent to Gemini",
+    labelnames=_LABELS,
+)
+llm_response_tokens = Counter(
+    "gemini_response_tokens_total",
+    "Response (candidate) tokens returned by Gemini",
+    labelnames=_LABELS,
+)
+llm_prompt_elided_tokens = Counter(
+    "gemini_prompt_elided_tokens_total",
+    "Estimated prompt tokens dropped to stay within PROMPT_TOKEN_BUDGET",
+    labelnames=_LABELS,
+)
+llm_retries = Counter(
+    "gemini_retries_total",
+    "Gemini attempts retried after a 429 or 5xx response",
+    labelnames=_LABELS,
+)
+llm_parse_failures = Counter(
+    "gemini_parse_failures_total",
+    "Gemini responses that did not parse in the expected format",
+    labelnames=_LABELS,
+)
+llm_cache_hits = Counter(
+    "gemini_cache_hits_total",
+    "Requests answered without a new Gemini call, by cache",
+    labelnames=_LABELS + ("cache",),
+)
+
+
+def record_usage(response: Any, endpoint: str, model: str) -> None:
+    """Add the token counts a response reports (if any) to the counters."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+    response_tokens = getattr(usage, "candidates_token_count", None) or 0
+    if prompt_tokens:
+        llm_prompt_tokens.inc(prompt_tokens, endpoint=endpoint, model=model)
+    if response_tokens:
+        llm_response_tokens.inc(response_tokens, endpoint=endpoint, model=model)
@@ -0,0 +1,162 @@
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_OVERFLOW_LABEL = "__other__"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = 1000,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _label_values(self, labels: Dict[str, str], known: Dict[LabelValues, object]) -> LabelValues:
+        values = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        # Label values can come from clients; cap the number of series so a
+        # stream of random ids cannot grow memory without bound.
+        if values not in known and len(known) >= self.max_series:
+            values = tuple(_OVERFLOW_LABEL for _ in self.labelnames)
+        return values
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            key = self._label_values(labels, self._values)
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            key = self._label_values(labels, self._values)
+            self._values[key] = float(value)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+        max_series: int = 1000,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets: List[float] = sorted(buckets) + [math.inf]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        with self._lock:
+            key = self._label_values(labels, self._series)
+            counts, totals = self._series.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            totals[0] += value
+
+    def snapshot(self) -> Dict[LabelValues, Dict[str, object]]:
+        """Cumulative bucket counts, total count and sum for each label set."""
+        with self._lock:
+            return {
+                key: {
+                    "buckets": list(zip(self.buckets, counts)),
+                    "count": counts[-1],
+                    "sum": totals[0],
+                }
+                for key, (counts, totals) in self._series.items()
+            }
+
+
+registry: List[_Metric] = []
+
+
+def histogram_summary(histogram: Histogram, label: Optional[str] = None) -> Dict[str, Dict[str, object]]:
+    """JSON-friendly view of a histogram keyed by one of its label values."""
+    index = histogram.labelnames.index(label) if label else None
+    summary: Dict[str, Dict[str, object]] = {}
+    for key, series in histogram.snapshot().items():
+        name = key[index] if index is not None else ""
+        count = series["count"]
+        summary[name] = {
+            "count": count,
+            "mean": series["sum"] / count if count else 0.0,  # type: ignore[operator]
+            "buckets": {
+                ("+Inf" if math.isinf(bound) else f"{bound:g}"): n
+                for bound, n in series["buckets"]  # type: ignore[union-attr]
+            },
+        }
+    return summary
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(metrics: Optional[Sequence[_Metric]] = None) -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for metric in registry if metrics is None else metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        if isinstance(metric, Histogram):
+            for key, series in sorted(metric.snapshot().items()):
+                for bound, count in series["buckets"]:  # type: ignore[union-attr]
+                    labels = _format_labels(metric.labelnames + ("le",), key + (_format_value(bound),))
+                    lines.append(f"{metric.name}_bucket{labels} {count}")
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(series['sum'])}")  # type: ignore[arg-type]
+                lines.append(f"{metric.name}_count{labels} {series['count']}")
+        elif isinstance(metric, (Counter, Gauge)):
+            for key, value in sorted(metric.snapshot().items()):
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,186 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sections are never shrunk below this many tokens to fit the total budget.
+_MIN_SECTION_TOKENS = 64
+
+_FRAME_PATTERN = re.compile(r'^  File "[^"]+", line \d+')
+_SUBMISSION_FILENAME = "<string>"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 ASCII characters per token, one per other character.
+
+    Japanese text tokenizes at roughly one token per character, so counting
+    non-ASCII characters individually keeps the estimate on the safe side.
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _prefix_within(text: str, max_tokens: int) -> str:
+    ascii_chars = other_chars = 0
+    for i, char in enumerate(text):
+        if ord(char) < 128:
+            ascii_chars += 1
+        else:
+            other_chars += 1
+        if (ascii_chars + 3) // 4 + other_chars > max_tokens:
+            return text[:i]
+    return text
+
+
+def _elision_marker(tokens: int) -> str:
+    return f"... ({tokens} tokens elided) ..."
+
+
+def truncate_middle(text: str, max_tokens: int) -> Tuple[str, int]:
+    """Keep the head and tail of ``text`` within ``max_tokens``.
+
+    Whole lines are kept where possible; the cut is marked in the text.
+    Returns the truncated text and the number of tokens elided.
+    """
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text, 0
+
+    lines = text.split("\n")
+    keep = max(0, max_tokens - estimate_tokens(_elision_marker(total)))
+    head_budget = keep * 2 // 3
+    tail_budget = keep - head_budget
+
+    head: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if used + cost > head_budget:
+            if not head:
+                # A single huge line: cut it by characters.
+                head.append(_prefix_within(line, head_budget))
+            break
+        head.append(line)
+        used += cost
+
+    tail: List[str] = []
+    used = 0
+    for line in reversed(lines[len(head) :]):
+        cost = estimate_tokens(line + "\n")
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    kept = "\n".join(head + tail)
+    elided = max(0, total - estimate_tokens(kept))
+    return "\n".join(head + [_elision_marker(elided)] + tail), elided
+
+
+def trim_traceback(message: str, max_frames: int) -> str:
+    """Drop traceback frames outside the submitted code.
+
+    Frames of the submission (``<string>``) are kept, up to the last
+    ``max_frames`` of them; when there are none, the last ``max_frames``
+    frames are kept instead. Non-traceback text is returned unchanged.
+    """
+    lines = message.split("\n")
+    try:
+        start = next(i for i, line in enumerate(lines) if line.startswith("Traceback (most recent call last):"))
+    except StopIteration:
+        return message
+
+    frames: List[List[str]] = []
+    end = start + 1
+    while end < len(lines):
+        if _FRAME_PATTERN.match(lines[end]):
+            frames.append([lines[end]])
+        elif lines[end].startswith("    ") and frames:
+            frames[-1].append(lines[end])
+        else:
+            break
+        end += 1
+
+    relevant = [frame for frame in frames if f'"{_SUBMISSION_FILENAME}"' in frame[0]]
+    kept = (relevant or frames)[-max_frames:] if max_frames > 0 else []
+    omitted = len(frames) - len(kept)
+
+    trimmed = lines[: start + 1]
+    if omitted:
+        trimmed.append(f"  ... ({omitted} frames omitted)")
+    for frame in kept:
+        trimmed.extend(frame)
+    trimmed.extend(lines[end:])
+    return "\n".join(trimmed)
+
+
+def summarize_test_results(test_results: List[Dict[str, Any]], max_traceback_frames: int) -> str:
+    """One entry per distinct (status, message), listing the test cases it covers."""
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, result in enumerate(test_results):
+        status = "成功" if result.get("status") == "success" else "失敗"
+        message = result.get("message", "")
+        if not isinstance(message, str):
+            message = str(message)
+        message = trim_traceback(message, max_traceback_frames)
+        groups.setdefault((status, message), []).append(i + 1)
+
+    text = ""
+    for (status, message), numbers in groups.items():
+        text += f"テストケース {', '.join(str(n) for n in numbers)}: {status}\n"
+        text += f"メッセージ: {message}\n\n"
+    return text
+
+
+@dataclass
+class PromptSection:
+    """One variable part of a prompt template.
+
+    ``max_tokens`` caps the section on its own; sections are additionally
+    shrunk, largest first, until the whole prompt fits the budget.
+    """
+
+    name: str
+    text: str
+    max_tokens: Optional[int] = None
+
+
+@dataclass
+class BudgetedPrompt:
+    text: str
+    estimated_tokens: int
+    elided_tokens: Dict[str, int]
+
+    @property
+    def total_elided(self) -> int:
+        return sum(self.elided_tokens.values())
+
+
+def build_prompt(template: str, sections: List[PromptSection], budget: int) -> BudgetedPrompt:
+    """Fill ``template`` (str.format fields named after the sections) within ``budget`` tokens."""
+    texts = {section.name: str(section.text) for section in sections}
+    elided = {section.name: 0 for section in sections}
+
+    for section in sections:
+        if section.max_tokens is not None:
+            texts[section.name], elided[section.name] = truncate_middle(texts[section.name], section.max_tokens)
+
+    fixed = estimate_tokens(template.format(**{name: "" for name in texts}))
+    sizes = {name: estimate_tokens(text) for name, text in texts.items()}
+    excess = fixed + sum(sizes.values()) - budget
+    while excess > 0:
+        name = max(sizes, key=sizes.__getitem__)
+        target = max(_MIN_SECTION_TOKENS, sizes[name] - excess)
+        if target >= sizes[name]:
+            break
+        shrunk, cut = truncate_middle(texts[name], target)
+        new_size = estimate_tokens(shrunk)
+        if new_size >= sizes[name]:
+            break
+        texts[name] = shrunk
+        elided[name] += cut
+        excess -= sizes[name] - new_size
+        sizes[name] = new_size
+
+    text = template.format(**texts)
+    return BudgetedPrompt(text, estimate_tokens(text), {k: v for k, v in elided.items() if v})
@@ -0,0 +1,54 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+
+from metrics import Histogram
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request until its response body was sent",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    labelnames=("method", "route", "status"),
+)
+
+
+class RequestMetricsMiddleware:
+    """Observe every HTTP request in ``http_request_duration``.
+
+    Written as plain ASGI (not BaseHTTPMiddleware) so streaming responses
+    are timed until their last chunk and disconnect detection is untouched.
+    Requests are labelled with the route template, not the raw path, to
+    keep the number of series bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state: Dict[str, Any] = {"status": 500}
+
+        async def _send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=str(state["status"]),
+            )
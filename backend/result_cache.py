@@ -0,0 +1,58 @@
+import ast
+import json
+from typing import Any, Dict, Optional
+
+import config
+from cache import LRUCache
+from fingerprint import source_fingerprint
+
+# Submissions importing any of these can print different output on every run.
+_NONDETERMINISTIC_MODULES = {"random", "time", "datetime", "secrets", "uuid", "os", "sys"}
+
+# Only statuses that depend on the code alone are reused; timeouts and
+# crashes also depend on how loaded the workers were, and the memory budget
+# is relative to what the worker already uses, so memory_exceeded can pass
+# on a fresh worker.
+_CACHEABLE_STATUSES = {"success", "error"}
+
+_results = LRUCache(config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL_SECONDS)
+
+
+def _is_deterministic(code: str) -> bool:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""]
+        else:
+            continue
+        if any(name.split(".")[0] in _NONDETERMINISTIC_MODULES for name in names):
+            return False
+    return True
+
+
+def result_cache_key(code: str, test_case: Dict[str, Any]) -> Optional[str]:
+    if not config.RESULT_CACHE_ENABLED or not _is_deterministic(code):
+        return None
+    test_case_key = json.dumps(test_case, sort_keys=True, ensure_ascii=False, default=str)
+    # Keyed on the exact source: error messages carry line numbers, so even
+    # comment or blank-line changes must not share results.
+    return f"{source_fingerprint(code)}:{test_case_key}"
+
+
+def get_cached_result(key: str) -> Optional[Dict[str, Any]]:
+    result = _results.get(key)
+    return dict(result) if result is not None else None
+
+
+def store_result(key: str, result: Dict[str, Any]) -> None:
+    if result.get("status") in _CACHEABLE_STATUSES:
+        _results.set(key, dict(result))
+
+
+def result_cache_stats() -> Dict[str, int]:
+    return _results.stats()
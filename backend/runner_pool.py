@@ -0,0 +1,377 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import code_runner
+from result_cache import get_cached_result, result_cache_key, store_result
+
+_READY = "ready"
+# How often a dispatcher waiting on a worker checks whether its job was aborted
+_ABORT_POLL_SECONDS = 0.1
+
+_Job = Tuple[Future, Callable[..., Any], tuple, dict, Optional[Callable[[Exception], Any]]]
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised on a job's future when its worker process died mid-job."""
+
+
+class JobTimeoutError(TimeoutError):
+    """Raised on a job's future when its worker had to be killed for running too long."""
+
+
+class JobAbortedError(RuntimeError):
+    """Raised on a running job's future after SandboxPool.cancel() killed its worker."""
+
+
+def _worker_main(conn: Connection, initializer: Optional[Callable[[], None]]) -> None:
+    if initializer is not None:
+        initializer()
+    # Announce readiness only after all imports are done so the pool
+    # never hands a job to a cold interpreter.
+    conn.send(_READY)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args, kwargs = job
+        try:
+            conn.send((True, fn(*args, **kwargs)))
+        except BaseException as exc:
+            # Includes SystemExit from a job: report it instead of letting it
+            # end the worker.
+            try:
+                conn.send((False, exc))
+            except Exception:
+                # The exception itself might not be picklable.
+                conn.send((False, RuntimeError(repr(exc))))
+
+
+def _test_case_failure(exc: Exception) -> Dict[str, Any]:
+    if isinstance(exc, JobTimeoutError):
+        return code_runner.timeout_result()
+    return {
+        "status": "error",
+        "message": f"Execution aborted: the sandbox process stopped unexpectedly ({exc}).",
+    }
+
+
+def _store_test_case_result(key: str, future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        store_result(key, future.result())
+
+
+class _Worker:
+    def __init__(self, ctx: Any, initializer: Optional[Callable[[], None]]) -> None:
+        parent_conn, child_conn = ctx.Pipe()
+        self.conn: Connection = parent_conn
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, initializer), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        if self.conn.recv() != _READY:
+            raise WorkerCrashedError("Worker failed to start")
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Fixed-size pool of pre-forked worker processes.
+
+    Each slot owns one worker process and one dispatcher thread that feeds it
+    jobs from a shared queue. Workers are replaced after
+    ``max_jobs_per_worker`` jobs (or when they die) so that state leaked by
+    student code does not accumulate. A worker that has not answered within
+    ``job_timeout`` seconds is killed and replaced. With ``size == 0`` jobs run
+    inline in the calling thread, which keeps local development and scripts
+    simple (no limits are enforced in that mode).
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs_per_worker: int = 200,
+        start_method: str = "forkserver",
+        job_timeout: Optional[float] = None,
+        initializer: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.size = max(0, size)
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self.start_method = start_method
+        self.job_timeout = job_timeout
+        self.initializer = initializer
+        self._jobs: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._completed = 0
+        self._recycled = 0
+        self._crashed = 0
+        self._timed_out = 0
+        self._aborted = 0
+        self._abort_requests: Set[Future] = set()
+        self._started = False
+        self._ctx: Any = None
+
+    def start(self) -> None:
+        if self._started or self.size == 0:
+            self._started = True
+            return
+        self._ctx = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            self._ctx.set_forkserver_preload(["runner_pool"])
+        # Spawn every worker up front so the first requests don't pay for it.
+        workers = [self._spawn_worker() for _ in range(self.size)]
+        for worker in workers:
+            thread = threading.Thread(target=self._dispatch_loop, args=(worker,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._started = True
+
+    def shutdown(self) -> None:
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        self._started = False
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        return self._submit(fn, args, kwargs, None)
+
+    def submit_test_case(
+        self, code: str, test_case: Dict[str, Any], collect_metrics: bool = False
+    ) -> Future:
+        """Run one test case; the future always resolves to a result dict.
+
+        Killed or crashed workers are reported as ``timeout`` / ``error``
+        results instead of exceptions. Repeated runs of the same code on the
+        same test case are answered from the result cache, except when
+        metrics are requested (they must describe a real run).
+        """
+        key = None if collect_metrics else result_cache_key(code, test_case)
+        if key is not None:
+            cached = get_cached_result(key)
+            if cached is not None:
+                future: Future = Future()
+                future.set_result(cached)
+                return future
+
+        future = self._submit(
+            code_runner.run_single_test_case,
+            (code, test_case, collect_metrics),
+            {},
+            _test_case_failure,
+        )
+        if key is not None:
+            future.add_done_callback(partial(_store_test_case_result, key))
+        return future
+
+    async def run_test_case(
+        self, code: str, test_case: Dict[str, Any], collect_metrics: bool = False
+    ) -> Dict[str, Any]:
+        """Awaitable submit_test_case; cancelling the caller cancels the job."""
+        if self.size == 0:
+            # Inline mode executes in the calling thread; keep it off the event loop.
+            return await asyncio.to_thread(
+                lambda: self.submit_test_case(code, test_case, collect_metrics).result()
+            )
+        future = self.submit_test_case(code, test_case, collect_metrics)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancel(future)
+            raise
+
+    async def passes_all_cases(self, code: str, test_cases: List[Dict[str, Any]]) -> bool:
+        """Run the cases concurrently and stop at the first ordinary failure.
+
+        Hitting a resource limit raises TimeoutError instead, since a
+        generated candidate that hangs or blows up memory must not be handed
+        out to students.
+        """
+        tasks = [asyncio.ensure_future(self.run_test_case(code, tc)) for tc in test_cases]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                status = result.get("status")
+                if status in ("timeout", "memory_exceeded"):
+                    raise TimeoutError(f"Candidate hit a resource limit ({status})")
+                if status != "success":
+                    return False
+        finally:
+            for task in tasks:
+                task.cancel()
+        return True
+
+    def cancel(self, future: Future) -> None:
+        """Cancel a job, killing its worker if the job is already running.
+
+        Used when nobody is waiting for the result any more (e.g. the client
+        disconnected) so abandoned submissions stop consuming CPU.
+        """
+        if future.cancel() or future.done():
+            return
+        with self._lock:
+            self._abort_requests.add(future)
+
+    def _submit(
+        self,
+        fn: Callable[..., Any],
+        args: tuple,
+        kwargs: dict,
+        on_failure: Optional[Callable[[Exception], Any]],
+    ) -> Future:
+        future: Future = Future()
+        if self.size == 0:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as exc:
+                    future.set_exception(exc)
+            return future
+        if not self._started:
+            raise RuntimeError("SandboxPool.start() must be called before submit()")
+        self._jobs.put((future, fn, args, kwargs, on_failure))
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "queueDepth": self._jobs.qsize(),
+                "busy": self._busy,
+                "completed": self._completed,
+                "recycled": self._recycled,
+                "crashed": self._crashed,
+                "timedOut": self._timed_out,
+                "aborted": self._aborted,
+            }
+
+    def _spawn_worker(self) -> _Worker:
+        return _Worker(self._ctx, self.initializer)
+
+    def _wait_for_worker(self, worker: _Worker, future: Future) -> Optional[Exception]:
+        deadline = None if self.job_timeout is None else time.monotonic() + self.job_timeout
+        while True:
+            wait = _ABORT_POLL_SECONDS
+            if deadline is not None:
+                wait = max(0.0, min(wait, deadline - time.monotonic()))
+            if worker.conn.poll(wait):
+                return None
+            with self._lock:
+                if future in self._abort_requests:
+                    self._abort_requests.discard(future)
+                    return JobAbortedError("Job was cancelled while running")
+            if deadline is not None and time.monotonic() >= deadline:
+                return JobTimeoutError(
+                    f"Worker did not finish within {self.job_timeout:g} seconds"
+                )
+
+    def _dispatch_loop(self, worker: _Worker) -> None:
+        current: Optional[_Worker] = worker
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                if current is not None:
+                    current.stop()
+                return
+            future, on_failure = job[0], job[4]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                current = self._run_job(current, job)
+            except Exception as exc:
+                # Whatever went wrong (a job that cannot be pickled, a worker
+                # that fails to spawn), fail this job only and keep serving
+                # the queue with a fresh worker.
+                with self._lock:
+                    self._crashed += 1
+                if not future.done():
+                    if on_failure is not None:
+                        future.set_result(on_failure(exc))
+                    else:
+                        future.set_exception(exc)
+                if current is not None:
+                    try:
+                        current.kill()
+                    except Exception:
+                        pass
+                current = None
+
+    def _run_job(self, worker: Optional[_Worker], job: _Job) -> _Worker:
+        """Run one job, spawning a worker first if needed; returns the worker for the next job."""
+        future, fn, args, kwargs, on_failure = job
+        if worker is None:
+            worker = self._spawn_worker()
+
+        with self._lock:
+            self._busy += 1
+        failure: Optional[Exception] = None
+        try:
+            worker.conn.send((fn, args, kwargs))
+            failure = self._wait_for_worker(worker, future)
+            if failure is None:
+                ok, value = worker.conn.recv()
+        except (EOFError, OSError) as exc:
+            failure = WorkerCrashedError(f"Worker process died: {exc!r}")
+        finally:
+            with self._lock:
+                self._busy -= 1
+                # The job may have finished before the dispatcher noticed the abort.
+                self._abort_requests.discard(future)
+
+        if failure is not None:
+            worker.kill()
+            with self._lock:
+                if isinstance(failure, JobTimeoutError):
+                    self._timed_out += 1
+                elif isinstance(failure, JobAbortedError):
+                    self._aborted += 1
+                else:
+                    self._crashed += 1
+            if on_failure is not None and not isinstance(failure, JobAbortedError):
+                future.set_result(on_failure(failure))
+            else:
+                future.set_exception(failure)
+            return self._spawn_worker()
+
+        with self._lock:
+            self._completed += 1
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+        worker.jobs_done += 1
+        if worker.jobs_done >= self.max_jobs_per_worker:
+            worker.stop()
+            worker = self._spawn_worker()
+            with self._lock:
+                self._recycled += 1
+        return worker
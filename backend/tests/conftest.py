@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules live at the top level of backend/ (``import config``), as when uvicorn runs from there.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Never reach the real Gemini API from the tests.
+os.environ.setdefault("GEMINI_TRANSPORT", "synthetic")
@@ -0,0 +1,167 @@
+import os
+
+import pytest
+
+import code_runner
+import config
+from runner_pool import SandboxPool
+
+# Jobs are pickled by reference, so they live at module level where the
+# workers can import them.
+
+
+def _enable_tight_limits() -> None:
+    config.RUN_TIME_LIMIT_SECONDS = 0.5
+    config.RUN_CPU_LIMIT_SECONDS = 1
+    config.RUN_MEMORY_LIMIT_MB = 64
+    code_runner.enable_resource_limits()
+
+
+def _run(code: str):
+    return code_runner.run_single_test_case(code, {"input": [], "expected": "ok"})
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+@pytest.fixture(scope="module")
+def limited_pool():
+    # job_timeout well past RUN_TIME_LIMIT_SECONDS, so the limits inside the
+    # worker are what stops a run.
+    pool = SandboxPool(size=1, job_timeout=10, initializer=_enable_tight_limits)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def _run_limited(pool: SandboxPool, code: str):
+    return pool.submit(_run, code).result(timeout=20)
+
+
+def test_success(limited_pool):
+    result = _run_limited(limited_pool, "def main():\n    print('ok')\n")
+    assert result["status"] == "success"
+
+
+def test_endless_loop_times_out(limited_pool):
+    result = _run_limited(limited_pool, "def main():\n    while True:\n        pass\n")
+    assert result["status"] == "timeout"
+
+
+def test_timeout_cannot_be_swallowed(limited_pool):
+    code = "def main():\n    while True:\n        try:\n            while True:\n                pass\n        except Exception:\n            pass\n"
+    assert _run_limited(limited_pool, code)["status"] == "timeout"
+
+
+def test_large_allocation_exceeds_memory(limited_pool):
+    result = _run_limited(limited_pool, "def main():\n    data = bytearray(512 * 1024 * 1024)\n")
+    assert result["status"] == "memory_exceeded"
+
+
+def test_raising_the_soft_limit_does_not_lift_the_memory_cap(limited_pool):
+    code = (
+        "import resource\n"
+        "def main():\n"
+        "    _, hard = resource.getrlimit(resource.RLIMIT_AS)\n"
+        "    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))\n"
+        "    data = bytearray(512 * 1024 * 1024)\n"
+    )
+    assert _run_limited(limited_pool, code)["status"] == "memory_exceeded"
+
+
+def test_sys_exit_is_an_error_and_keeps_the_worker(limited_pool):
+    pid = limited_pool.submit(_pid).result(timeout=20)
+    result = _run_limited(limited_pool, "import sys\ndef main():\n    sys.exit(3)\n")
+    assert result["status"] == "error"
+    assert "SystemExit" in result["message"]
+    assert limited_pool.submit(_pid).result(timeout=20) == pid
+
+
+def test_limits_are_restored_after_a_run(limited_pool):
+    _run_limited(limited_pool, "def main():\n    data = bytearray(512 * 1024 * 1024)\n")
+    result = _run_limited(limited_pool, "def main():\n    data = bytearray(32 * 1024 * 1024)\n    print('ok')\n")
+    assert result["status"] == "success"
+
+
+_CAPTURE_CASES = [
+    ("42", "42\n"),
+    ("42", "  \n42  \n\n"),
+    ("42", "4\n2\n"),
+    ("42", "420\n"),
+    ("42", "4"),
+    ("42", ""),
+    ("", ""),
+    ("", " \n\t"),
+    ("", "x"),
+    ("a b\nc", "a b\nc\n"),
+    ("a b\nc", "a  b\nc"),
+    ("a b\nc", "a b\nc\nd"),
+    ("[1, 2]", "[1, 2]　\n"),
+    ("こんにちは", "\nこんにちは\n"),
+    ("こんにちは", "こんにち"),
+]
+
+
+def _chunkings(output: str):
+    yield [output]
+    yield list(output)
+    for cut in range(1, len(output)):
+        yield [output[:cut], output[cut:]]
+
+
+@pytest.mark.parametrize("expected, output", _CAPTURE_CASES)
+def test_capture_compares_like_strip_and_compare(expected, output):
+    for chunks in _chunkings(output):
+        capture = code_runner._OutputCapture(expected, limit_bytes=1024)
+        for chunk in chunks:
+            capture.write(chunk)
+        assert capture.matches() == (output.strip() == expected.strip()), chunks
+        assert capture.getvalue() == output
+
+
+def test_capture_keeps_at_most_limit_bytes_but_compares_everything():
+    expected = "x" * 100
+    capture = code_runner._OutputCapture(expected, limit_bytes=10)
+    for _ in range(10):
+        capture.write("x" * 10)
+    assert capture.truncated
+    assert capture.getvalue() == "x" * 10
+    assert capture.matches()
+    capture.write("y")
+    assert not capture.matches()
+
+
+def test_capture_truncates_on_a_character_boundary():
+    capture = code_runner._OutputCapture("", limit_bytes=4)
+    capture.write("ああ")
+    assert capture.truncated
+    assert capture.getvalue() == "あ"
+
+
+def test_capture_at_exactly_the_limit_is_not_truncated():
+    capture = code_runner._OutputCapture("", limit_bytes=4)
+    capture.write("abcd")
+    assert not capture.truncated
+    assert capture.getvalue() == "abcd"
+
+
+# Enough 101-byte lines to overflow RUN_OUTPUT_LIMIT_BYTES.
+_LINES = config.RUN_OUTPUT_LIMIT_BYTES // 100 + 10
+
+
+def test_run_truncates_output_at_the_configured_limit():
+    code = f"def main():\n    for _ in range({_LINES}):\n        print('x' * 100)\n"
+    result = code_runner.run_single_test_case(code, {"input": [], "expected": "..."})
+    assert result["status"] == "error"
+    assert result["truncated"]
+    assert len(result["actual_output"].encode("utf-8")) <= config.RUN_OUTPUT_LIMIT_BYTES
+
+
+def test_run_matches_long_output_past_the_limit():
+    line = "x" * 100
+    expected = "\n".join([line] * _LINES)
+    code = f"def main():\n    for _ in range({_LINES}):\n        print({line!r})\n"
+    result = code_runner.run_single_test_case(code, {"input": [], "expected": expected})
+    assert result["status"] == "success"
+    assert result["truncated"]
@@ -0,0 +1,43 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from gemini_cassette import CassetteClient, CassetteMissError
+
+
+class _FakeAsyncModels:
+    async def generate_content(self, *, model, contents, config=None):
+        return SimpleNamespace(text=f"whole:{contents}", usage_metadata=None)
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        async def chunks():
+            for part in ("streamed:", contents):
+                yield SimpleNamespace(text=part, usage_metadata=None)
+
+        return chunks()
+
+
+_INNER = SimpleNamespace(aio=SimpleNamespace(models=_FakeAsyncModels()))
+
+
+async def _both(client):
+    response = await client.aio.models.generate_content(model="m", contents="prompt")
+    stream = await client.aio.models.generate_content_stream(model="m", contents="prompt")
+    return response.text, [chunk.text async for chunk in stream]
+
+
+def test_streamed_and_whole_recordings_of_one_prompt_are_kept_apart(tmp_path):
+    recorder = CassetteClient("record", str(tmp_path), inner=_INNER)
+    recorded = asyncio.run(_both(recorder))
+    assert len(os.listdir(tmp_path)) == 2
+
+    player = CassetteClient("replay", str(tmp_path), replay_latency=False)
+    assert asyncio.run(_both(player)) == recorded == ("whole:prompt", ["streamed:", "prompt"])
+
+
+def test_replay_of_an_unrecorded_request_misses(tmp_path):
+    player = CassetteClient("replay", str(tmp_path), replay_latency=False)
+    with pytest.raises(CassetteMissError):
+        asyncio.run(player.aio.models.generate_content(model="m", contents="prompt"))
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.genai")
+from google.genai import errors  # noqa: E402
+
+from gemini_scheduler import (  # noqa: E402
+    GeminiScheduler,
+    GeminiUnavailableError,
+    Priority,
+    SchedulerSaturatedError,
+)
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        scheduler = GeminiScheduler(rate_per_minute=60_000, burst=10, max_concurrency=1, max_queue=10)
+        order = []
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        async def record(name):
+            order.append(name)
+
+        running = asyncio.ensure_future(scheduler.run(blocker, Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.ensure_future(scheduler.run(lambda: record("background"), Priority.BACKGROUND)),
+            asyncio.ensure_future(scheduler.run(lambda: record("generation"), Priority.GENERATION)),
+            asyncio.ensure_future(scheduler.run(lambda: record("interactive-1"), Priority.INTERACTIVE)),
+            asyncio.ensure_future(scheduler.run(lambda: record("interactive-2"), Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(running, *queued)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive-1", "interactive-2", "generation", "background"]
+
+
+def test_full_queue_rejects_with_retry_after_but_admits_interactive():
+    async def scenario():
+        scheduler = GeminiScheduler(rate_per_minute=60_000, burst=10, max_concurrency=1, max_queue=4)
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        tasks = [asyncio.ensure_future(scheduler.run(blocker, Priority.INTERACTIVE))]
+        await asyncio.sleep(0)
+        # BACKGROUND may fill half of the queue.
+        tasks += [asyncio.ensure_future(scheduler.run(blocker, Priority.BACKGROUND)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerSaturatedError) as rejected:
+            await scheduler.run(blocker, Priority.BACKGROUND)
+        tasks.append(asyncio.ensure_future(scheduler.run(blocker, Priority.INTERACTIVE)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        return scheduler, rejected.value
+
+    scheduler, rejected = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert scheduler.rejected == 1
+    assert scheduler.completed == 4
+
+
+def test_retryable_errors_are_retried_then_surface_as_unavailable():
+    async def scenario():
+        scheduler = GeminiScheduler(
+            rate_per_minute=60_000, burst=10, max_concurrency=1, max_queue=4, max_retries=2, backoff_base=0.001
+        )
+        attempts = 0
+
+        async def overloaded():
+            nonlocal attempts
+            attempts += 1
+            raise errors.ServerError(503, {"error": {"message": "overloaded"}})
+
+        with pytest.raises(GeminiUnavailableError) as unavailable:
+            await scheduler.run(overloaded, Priority.INTERACTIVE)
+        return scheduler, attempts, unavailable.value
+
+    scheduler, attempts, unavailable = asyncio.run(scenario())
+    assert attempts == 3
+    assert scheduler.retried == 2
+    assert scheduler.failed == 1
+    assert unavailable.retry_after >= 1
+    assert not isinstance(unavailable, SchedulerSaturatedError)
+
+
+def test_other_errors_are_not_retried():
+    async def scenario():
+        scheduler = GeminiScheduler(rate_per_minute=60_000, burst=10, max_concurrency=1, max_queue=4)
+
+        async def broken():
+            raise ValueError("bad prompt")
+
+        with pytest.raises(ValueError):
+            await scheduler.run(broken, Priority.INTERACTIVE)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.retried == 0
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+pytest.importorskip("google.genai")
+from gemini_utils import _HintLevelStreamParser  # noqa: E402
+
+LEVELS = [
+    {"level": 1, "title": "方針", "content": "ループの範囲を確認しましょう。"},
+    {"level": 2, "title": "場所", "content": 'range(len(nums)) の "終わり" に注目 {ヒント}'},
+    {"level": 3, "title": "修正", "content": "range(len(nums) - 1) を range(len(nums)) に。\\n"},
+]
+
+
+def _stream(text, size):
+    parser = _HintLevelStreamParser()
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.append(parser.feed(text[start : start + size]))
+    return parser, emitted
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_levels_are_emitted_as_soon_as_complete(size):
+    text = "```json\n" + json.dumps({"levels": LEVELS}, ensure_ascii=False) + "\n```"
+    parser, emitted = _stream(text, size)
+    assert [item for chunk in emitted for item in chunk] == LEVELS
+    assert parser.text == text
+
+
+def test_first_level_arrives_before_the_payload_is_complete():
+    text = json.dumps({"levels": LEVELS}, ensure_ascii=False)
+    cut = text.index('{"level": 2')
+    parser = _HintLevelStreamParser()
+    assert parser.feed(text[:cut]) == LEVELS[:1]
+    assert parser.feed(text[cut:]) == LEVELS[1:]
+
+
+def test_braces_and_quotes_inside_strings_do_not_end_an_item():
+    text = json.dumps({"hints": [LEVELS[1]]}, ensure_ascii=False)
+    _, emitted = _stream(text, 1)
+    assert [item for chunk in emitted for item in chunk] == [LEVELS[1]]
+
+
+def test_nothing_after_the_array_is_scanned():
+    text = json.dumps({"levels": LEVELS[:1], "extra": [{"level": 9}]}, ensure_ascii=False)
+    _, emitted = _stream(text, 5)
+    assert [item for chunk in emitted for item in chunk] == LEVELS[:1]
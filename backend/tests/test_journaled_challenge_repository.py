@@ -0,0 +1,76 @@
+import json
+
+from database.journaled_challenge_repository import JournaledChallengeRepository
+from database.models.challenge import Challenge
+
+
+def _challenge(challenge_id, title="title"):
+    return Challenge.from_dict(
+        {
+            "id": challenge_id,
+            "title": title,
+            "description": "",
+            "difficulty": "easy",
+            "image": "",
+            "languages": ["python"],
+            "instructions": "",
+            "examples": "",
+            "video": "",
+            "testCases": [{"input": [1], "expected": 1}],
+        }
+    )
+
+
+def _repository(tmp_path, compact_after=100):
+    return JournaledChallengeRepository(str(tmp_path / "challenges.json"), compact_after=compact_after)
+
+
+def test_writes_are_journaled_and_seen_by_a_fresh_reader(tmp_path):
+    repository = _repository(tmp_path)
+    repository.create_challenge(_challenge("a"))
+    repository.create_challenge(_challenge("b"))
+    repository.update_challenge("a", _challenge("a", title="renamed"))
+    repository.delete_challenge("b")
+
+    assert json.loads((tmp_path / "challenges.json").read_text()) == []
+    assert len((tmp_path / "challenges.json.journal").read_text().splitlines()) == 4
+    reader = _repository(tmp_path)
+    assert [(c.id, c.title) for c in reader.get_all_challenges()] == [("a", "renamed")]
+
+
+def test_torn_tail_is_ignored_and_truncated_by_the_next_append(tmp_path):
+    repository = _repository(tmp_path)
+    repository.create_challenge(_challenge("a"))
+    journal = tmp_path / "challenges.json.journal"
+    with open(journal, "ab") as file:
+        file.write(b'{"op": "put", "challenge": {"id": "tor')
+
+    reader = _repository(tmp_path)
+    assert [c.id for c in reader.get_all_challenges()] == ["a"]
+    reader.create_challenge(_challenge("b"))
+
+    lines = journal.read_text().splitlines()
+    assert [json.loads(line)["challenge"]["id"] for line in lines] == ["a", "b"]
+    assert [c.id for c in _repository(tmp_path).get_all_challenges()] == ["a", "b"]
+
+
+def test_compact_folds_the_journal_into_the_snapshot(tmp_path):
+    repository = _repository(tmp_path)
+    for challenge_id in "abc":
+        repository.create_challenge(_challenge(challenge_id))
+    repository.delete_challenge("b")
+    repository.compact()
+
+    assert (tmp_path / "challenges.json.journal").read_bytes() == b""
+    assert [c["id"] for c in json.loads((tmp_path / "challenges.json").read_text())] == ["a", "c"]
+    assert [c.id for c in _repository(tmp_path).get_all_challenges()] == ["a", "c"]
+
+
+def test_compaction_runs_once_the_threshold_is_reached(tmp_path):
+    repository = _repository(tmp_path, compact_after=3)
+    for challenge_id in "abc":
+        repository.create_challenge(_challenge(challenge_id))
+    repository._compactor.join(timeout=5)
+
+    assert (tmp_path / "challenges.json.journal").read_bytes() == b""
+    assert [c.id for c in repository.get_all_challenges()] == ["a", "b", "c"]
@@ -0,0 +1,24 @@
+import pytest
+
+from result_cache import get_cached_result, result_cache_key, store_result
+
+_TEST_CASE = {"input": [1], "expected": 1}
+
+
+@pytest.mark.parametrize("status, cached", [
+    ("success", True),
+    ("error", True),
+    ("timeout", False),
+    ("memory_exceeded", False),
+])
+def test_only_results_that_depend_on_the_code_alone_are_cached(status, cached):
+    key = result_cache_key(f"def main(x):\n    print(x)  # {status}\n", _TEST_CASE)
+    store_result(key, {"status": status})
+    assert (get_cached_result(key) is not None) == cached
+
+
+def test_key_changes_with_comments_and_skips_nondeterministic_code():
+    assert result_cache_key("def main():\n    pass\n", _TEST_CASE) != result_cache_key(
+        "def main():\n    pass  # note\n", _TEST_CASE
+    )
+    assert result_cache_key("import random\ndef main():\n    pass\n", _TEST_CASE) is None
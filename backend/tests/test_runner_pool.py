@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from runner_pool import JobAbortedError, JobTimeoutError, SandboxPool, WorkerCrashedError
+
+# Jobs are pickled by reference, so they live at module level where the
+# workers can import them.
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+def _add(a: int, b: int) -> int:
+    return a + b
+
+
+def _fail() -> None:
+    raise ValueError("job failed")
+
+
+def _crash() -> None:
+    os._exit(1)
+
+
+def _sleep(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        options = {"size": 1, "job_timeout": 2.0, "max_jobs_per_worker": 2}
+        options.update(kwargs)
+        pool = SandboxPool(**options)
+        pool.start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def _wait_until_running(future: Future) -> None:
+    deadline = time.monotonic() + 5
+    while not future.running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_submit_returns_the_result_or_raises_the_job_error(make_pool):
+    pool = make_pool()
+    assert pool.submit(_add, 2, b=3).result(timeout=10) == 5
+    with pytest.raises(ValueError, match="job failed"):
+        pool.submit(_fail).result(timeout=10)
+    assert pool.stats()["completed"] == 2
+
+
+def test_jobs_run_outside_the_calling_process(make_pool):
+    pool = make_pool()
+    assert pool.submit(_pid).result(timeout=10) != os.getpid()
+
+
+def test_worker_is_killed_after_job_timeout_and_replaced(make_pool):
+    pool = make_pool(job_timeout=0.3)
+    with pytest.raises(JobTimeoutError):
+        pool.submit(_sleep, 10).result(timeout=10)
+    assert pool.submit(_add, 1, 1).result(timeout=10) == 2
+    assert pool.stats()["timedOut"] == 1
+
+
+def test_crashed_worker_fails_its_job_only(make_pool):
+    pool = make_pool()
+    first = pool.submit(_pid).result(timeout=10)
+    with pytest.raises(WorkerCrashedError):
+        pool.submit(_crash).result(timeout=10)
+    second = pool.submit(_pid).result(timeout=10)
+    assert second != first
+    assert pool.stats()["crashed"] == 1
+
+
+def test_worker_is_recycled_after_max_jobs(make_pool):
+    pool = make_pool(max_jobs_per_worker=2)
+    pids = [pool.submit(_pid).result(timeout=10) for _ in range(3)]
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.stats()["recycled"] == 1
+
+
+def test_cancel_kills_a_running_job(make_pool):
+    pool = make_pool(job_timeout=None)
+    future = pool.submit(_sleep, 10)
+    _wait_until_running(future)
+    pool.cancel(future)
+    with pytest.raises(JobAbortedError):
+        future.result(timeout=5)
+    assert pool.submit(_add, 1, 2).result(timeout=10) == 3
+    assert pool.stats()["aborted"] == 1
+
+
+def test_cancel_drops_a_queued_job(make_pool):
+    pool = make_pool(job_timeout=None)
+    running = pool.submit(_sleep, 0.5)
+    queued = pool.submit(_pid)
+    pool.cancel(queued)
+    assert queued.cancelled()
+    running.result(timeout=10)
+
+
+def test_submit_test_case_reports_a_killed_worker_as_timeout(make_pool):
+    pool = make_pool(job_timeout=0.3)
+    code = "import time\ndef main():\n    time.sleep(10)\n"
+    result = pool.submit_test_case(code, {"input": [], "expected": ""}, collect_metrics=True).result(timeout=10)
+    assert result["status"] == "timeout"
+
+
+def test_passes_all_cases(make_pool):
+    pool = make_pool()
+    code = "def main(x):\n    print(x * 2)\n"
+    cases = [{"input": [1], "expected": 2}, {"input": [3], "expected": 6}]
+    assert asyncio.run(pool.passes_all_cases(code, cases)) is True
+    cases.append({"input": [4], "expected": 9})
+    assert asyncio.run(pool.passes_all_cases(code, cases)) is False
+
+
+def test_passes_all_cases_raises_on_a_resource_limit(make_pool):
+    pool = make_pool(job_timeout=0.3)
+    code = "def main():\n    while True:\n        pass\n"
+    with pytest.raises(TimeoutError):
+        asyncio.run(pool.passes_all_cases(code, [{"input": [], "expected": ""}]))
+
+
+def test_inline_pool_runs_in_the_calling_process():
+    pool = SandboxPool(size=0)
+    pool.start()
+    assert pool.submit(_pid).result() == os.getpid()
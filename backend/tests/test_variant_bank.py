@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.genai")
+import variant_bank  # noqa: E402
+from database.challenge_repository import ChallengeRepository  # noqa: E402
+from database.models.challenge import Challenge  # noqa: E402
+from database.variant_repository import VariantRepository  # noqa: E402
+
+
+def _challenge(expected):
+    return Challenge.from_dict(
+        {
+            "id": "sum",
+            "title": "",
+            "description": "",
+            "difficulty": "easy",
+            "image": "",
+            "languages": ["python"],
+            "instructions": "Print the sum.",
+            "examples": "",
+            "video": "",
+            "testCases": [{"input": [1, 2], "expected": expected}],
+        }
+    )
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    async def fake_generate_variants(prompt, test_cases, validate_candidate):
+        return [
+            {"code": f"def main(a, b):\n    print(a - b)  # {i}\n", "fixed_code": "...", "explanation": "..."}
+            for i in range(3)
+        ]
+
+    monkeypatch.setattr(variant_bank, "generate_variants", fake_generate_variants)
+    challenges = ChallengeRepository(str(tmp_path / "challenges.json"))
+    challenges.create_challenge(_challenge(3))
+    repository = VariantRepository(str(tmp_path / "variant_bank.json"))
+
+    async def never_called(code, test_cases):
+        raise AssertionError("generate_variants is faked")
+
+    return variant_bank.VariantBank(repository, challenges, never_called, target_size=3, low_watermark=0)
+
+
+def test_refilled_variants_are_handed_out(bank):
+    assert asyncio.run(bank.refill("sum")) == 3
+    variant = asyncio.run(bank.take("sum"))
+    assert variant["challengeKey"] == variant_bank.challenge_key(_challenge(3))
+    assert bank.repository.count("sum") == 2
+
+
+def test_variants_of_an_edited_challenge_are_dropped(bank):
+    asyncio.run(bank.refill("sum"))
+    bank.challenges.update_challenge("sum", _challenge(4))
+
+    assert asyncio.run(bank.take("sum")) is None
+    assert bank.repository.count("sum") == 0
+    assert asyncio.run(bank.refill("sum")) == 3
+    assert asyncio.run(bank.take("sum"))["challengeKey"] == variant_bank.challenge_key(_challenge(4))
+
+
+def test_deleted_challenge_gets_no_variant(bank):
+    asyncio.run(bank.refill("sum"))
+    bank.challenges.delete_challenge("sum")
+    assert asyncio.run(bank.take("sum")) is None
@@ -0,0 +1,203 @@
+"""Per-challenge bank of pre-validated buggy variants.
+
+/api/generate-code hands out a banked variant instead of waiting on Gemini;
+taking one that leaves the bank below VARIANT_BANK_LOW_WATERMARK starts a
+background refill for that challenge. Fill the whole catalog ahead of a
+class from the backend directory with:
+
+    python -m variant_bank --prewarm
+    python -m variant_bank --prewarm --challenge <id> --target 10
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import config
+from database.challenge_repository import ChallengeRepository, create_challenge_repository
+from database.models.challenge import Challenge
+from database.variant_repository import VariantRepository
+from gemini_utils import code_generation_prompt, generate_variants
+from llm_metrics import llm_cache_hits
+
+Validator = Callable[[str, List[Dict[str, Any]]], Awaitable[bool]]
+
+
+def challenge_key(challenge: Challenge) -> str:
+    """Fingerprint of what a variant was generated and validated against.
+
+    Editing a challenge's instructions or test cases changes it, so variants
+    banked for the old version are no longer handed out.
+    """
+    payload = {
+        "instructions": challenge.instructions,
+        "testCases": [test_case.to_dict() for test_case in challenge.testCases],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class VariantBank:
+    def __init__(
+        self,
+        repository: VariantRepository,
+        challenges: ChallengeRepository,
+        validate_candidate: Validator,
+        target_size: int = 6,
+        low_watermark: int = 2,
+        max_refill_attempts: int = 3,
+    ) -> None:
+        self.repository = repository
+        self.challenges = challenges
+        self.validate_candidate = validate_candidate
+        self.target_size = target_size
+        self.low_watermark = low_watermark
+        self.max_refill_attempts = max_refill_attempts
+        self._refills: Dict[str, "asyncio.Task[int]"] = {}
+        self._hits = 0
+        self._misses = 0
+        self._refilled = 0
+        self._refill_failures = 0
+
+    async def take(self, challenge_id: str) -> Optional[Dict[str, Any]]:
+        """Remove and return a random banked variant, or None when the bank is empty.
+
+        Only variants made for the challenge as it is now are handed out.
+        Schedules a refill when the remaining stock is low. File IO runs in a
+        worker thread so the event loop is not blocked.
+        """
+        challenge = await asyncio.to_thread(self.challenges.get_challenge_by_id, challenge_id)
+        if challenge is None:
+            self._misses += 1
+            return None
+        key = challenge_key(challenge)
+        variant = await asyncio.to_thread(self.repository.pop_random_variant, challenge_id, key)
+        if variant is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            llm_cache_hits.inc(endpoint="generate_code", model=config.GEMINI_MODEL_NAME, cache="variant_bank")
+        if await asyncio.to_thread(self.repository.count, challenge_id, key) < self.low_watermark:
+            self.schedule_refill(challenge_id)
+        return variant
+
+    def schedule_refill(self, challenge_id: str) -> None:
+        """Start a background refill unless one is already running for this challenge."""
+        task = self._refills.get(challenge_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.ensure_future(self.refill(challenge_id))
+        self._refills[challenge_id] = task
+        task.add_done_callback(lambda t, cid=challenge_id: self._refill_done(cid, t))
+
+    def _refill_done(self, challenge_id: str, task: "asyncio.Task[int]") -> None:
+        if self._refills.get(challenge_id) is task:
+            del self._refills[challenge_id]
+        if not task.cancelled() and task.exception() is not None:
+            self._refill_failures += 1
+            print(f"Variant bank refill for {challenge_id} failed: {task.exception()}")
+
+    async def refill(self, challenge_id: str, target_size: Optional[int] = None) -> int:
+        """Generate variants until the challenge holds ``target_size`` of them.
+
+        Every candidate that fails at least one test case is banked with its
+        ``fixed_code`` and ``explanation``. Returns the number of variants added.
+        """
+        target = target_size if target_size is not None else self.target_size
+        challenge = await asyncio.to_thread(self.challenges.get_challenge_by_id, challenge_id)
+        if challenge is None:
+            return 0
+        key = challenge_key(challenge)
+        test_cases = [test_case.to_dict() for test_case in challenge.testCases]
+        prompt = code_generation_prompt(challenge.instructions, endpoint="variant_bank")
+
+        added = 0
+        for _ in range(self.max_refill_attempts):
+            if await asyncio.to_thread(self.repository.count, challenge_id, key) >= target:
+                break
+            variants = await generate_variants(prompt, test_cases, self.validate_candidate)
+            created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            added += await asyncio.to_thread(
+                self.repository.add_variants,
+                challenge_id,
+                [{**variant, "createdAt": created_at, "challengeKey": key} for variant in variants],
+            )
+        self._refilled += added
+        return added
+
+    async def shutdown(self) -> None:
+        tasks = list(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "refilled": self._refilled,
+            "refillFailures": self._refill_failures,
+            "refilling": sorted(self._refills),
+            "stock": self.repository.counts(),
+        }
+
+
+async def _prewarm(challenge_ids: List[str], target_size: int, concurrency: int) -> None:
+    from code_runner import enable_resource_limits
+    from runner_pool import SandboxPool
+
+    pool = SandboxPool(
+        size=config.RUNNER_POOL_SIZE,
+        max_jobs_per_worker=config.RUNNER_MAX_JOBS_PER_WORKER,
+        start_method=config.RUNNER_START_METHOD,
+        job_timeout=config.RUN_TIME_LIMIT_SECONDS + config.RUN_KILL_GRACE_SECONDS,
+        initializer=enable_resource_limits,
+    )
+    pool.start()
+    try:
+        challenges = create_challenge_repository()
+        bank = VariantBank(
+            VariantRepository(config.VARIANT_BANK_PATH),
+            challenges,
+            pool.passes_all_cases,
+            target_size=target_size,
+            max_refill_attempts=config.VARIANT_BANK_MAX_REFILL_ATTEMPTS,
+        )
+        if not challenge_ids:
+            challenge_ids = [challenge.id for challenge in challenges.get_all_challenges()]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(challenge_id: str) -> None:
+            async with semaphore:
+                try:
+                    added = await bank.refill(challenge_id)
+                except Exception as exc:
+                    print(f"{challenge_id}: refill failed: {exc}")
+                    return
+            print(f"{challenge_id}: +{added} (stock {bank.repository.count(challenge_id)})")
+
+        await asyncio.gather(*(_one(challenge_id) for challenge_id in challenge_ids))
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prewarm", action="store_true", help="fill the bank up to the target size")
+    parser.add_argument("--challenge", action="append", default=[], help="challenge id (repeatable; default: all)")
+    parser.add_argument("--target", type=int, default=config.VARIANT_BANK_TARGET_SIZE, help="variants per challenge")
+    parser.add_argument("--concurrency", type=int, default=4, help="challenges refilled at once")
+    args = parser.parse_args()
+
+    if args.prewarm:
+        asyncio.run(_prewarm(args.challenge, args.target, args.concurrency))
+    else:
+        counts = VariantRepository(config.VARIANT_BANK_PATH).counts()
+        for challenge_id, count in sorted(counts.items()):
+            print(f"{challenge_id}: {count}")
+
+
+if __name__ == "__main__":
+    main()
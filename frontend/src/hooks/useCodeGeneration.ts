@@ -13,6 +13,7 @@ interface CodeGenerationResponse {
 interface CodeGenerationRequest {
   challenge?: string;
   testCases?: unknown[];
+  challengeId?: string;
 }
 
 export function useCodeGeneration() {
@@ -31,6 +32,7 @@ export function useCodeGeneration() {
       const requestBody: CodeGenerationRequest = {
         challenge: challenge?.instructions,
         testCases: challenge?.testCases,
+        challengeId: challenge?.id,
       };
 
       const response = await fetch(API_ENDPOINTS.GENERATE_CODE, {
@@ -99,6 +101,8 @@ export function useCodeExecution() {
         body: JSON.stringify({
           code,
           testCases: challenge.testCases,
+          challengeId: challenge.id,
+          parallel: true,
         }),
       });
 
@@ -124,7 +128,12 @@ export function useCodeExecution() {
               if (data.status && data.status !== 'success') {
                 anyFailure = true;
               }
-              setTestResults((prev) => [...prev, data]);
+              // Results arrive in completion order; keep them sorted by case number
+              setTestResults((prev) =>
+                [...prev, data].sort(
+                  (a, b) => (a.testCaseNumber ?? 0) - (b.testCaseNumber ?? 0)
+                )
+              );
             } catch (e) {
               console.error('Failed to parse SSE data:', e);
             }
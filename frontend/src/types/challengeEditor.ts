@@ -8,11 +8,13 @@ export type HintLevel = {
 
 export type TestResult = {
   testCase: number;
-  status: 'success' | 'failure' | 'forbidden' | 'error';
+  testCaseNumber?: number;
+  status: 'success' | 'failure' | 'forbidden' | 'error' | 'timeout' | 'memory_exceeded';
   message?: string;
   input?: any[];
   expected_output?: string;
   actual_output?: string;
+  truncated?: boolean;
 };
 
 export interface SuccessModalProps {